@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Table, Date
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Table, Date, Index, JSON, func
 from sqlalchemy.orm import relationship
 from app.db.database import Base  # Import from base.py instead
 
@@ -10,6 +10,10 @@ recipe_ingredient = Table(
     Column('ingredient_id', Integer, ForeignKey('ingredients.id'), primary_key=True),
     Column('amount', Float),
     Column('unit', String),
+    # Reverse lookup: which recipes use an ingredient
+    Index('ix_recipe_ingredient_ingredient_id', 'ingredient_id', 'recipe_id'),
+    # Covers grocery list aggregation without reading the table rows
+    Index('ix_recipe_ingredient_recipe_covering', 'recipe_id', 'ingredient_id', 'unit', 'amount'),
 )
 
 # Association table for meal plan-recipe relationship
@@ -20,6 +24,20 @@ meal_plan_recipe = Table(
     Column('recipe_id', Integer, ForeignKey('recipes.id'), primary_key=True),
     Column('day', Integer, primary_key=True),  # Add to primary key
     Column('meal_type', String, primary_key=True),  # Add to primary key
+    # Reverse lookup: which plans use a recipe
+    Index('ix_meal_plan_recipe_recipe_id', 'recipe_id', 'meal_plan_id'),
+)
+
+# Nutrition totals per plan day, materialized whenever a plan's assignments change
+meal_plan_day_summary = Table(
+    'meal_plan_day_summary',
+    Base.metadata,
+    Column('meal_plan_id', Integer, ForeignKey('meal_plans.id'), primary_key=True),
+    Column('day', Integer, primary_key=True),
+    Column('total_calories', Float, nullable=False, default=0.0),
+    Column('total_protein', Float, nullable=False, default=0.0),
+    Column('total_carbs', Float, nullable=False, default=0.0),
+    Column('total_fat', Float, nullable=False, default=0.0),
 )
 
 class Recipe(Base):
@@ -45,6 +63,11 @@ class Recipe(Base):
     ingredients = relationship("Ingredient", secondary=recipe_ingredient, back_populates="recipes")
     meal_plans = relationship("MealPlan", secondary=meal_plan_recipe, back_populates="recipes")
 
+# Indexes backing recipe search; the expressions must match the ones used in the filters
+Index('ix_recipes_macros', Recipe.calories, Recipe.protein, Recipe.carbs, Recipe.fat)
+Index('ix_recipes_total_time', Recipe.prep_time + Recipe.cook_time)
+Index('ix_recipes_name_lower', func.lower(Recipe.name))
+
 class Ingredient(Base):
     __tablename__ = "ingredients"
     __table_args__ = {'extend_existing': True}
@@ -56,6 +79,10 @@ class Ingredient(Base):
     protein_per_100g = Column(Float)
     carbs_per_100g = Column(Float)
     fat_per_100g = Column(Float)
+
+    # Conversions for recipe lines measured by volume or by count
+    grams_per_ml = Column(Float, nullable=True)
+    grams_per_piece = Column(Float, nullable=True)
     
     # Relationships
     recipes = relationship("Recipe", secondary=recipe_ingredient, back_populates="ingredients")
@@ -77,6 +104,20 @@ class MealPlan(Base):
     error_margin = Column(Float, default=0.1)
     max_repeating_days = Column(Integer, default=2)
     allow_cheat_meal = Column(Boolean, default=False)
+    # Seed the assignments were generated with; NULL when they were random
+    seed = Column(Integer, nullable=True)
+    # Ingredient filters (sorted id lists) applied to the recipe pools
+    include_ingredient_ids = Column(JSON, nullable=True)
+    exclude_ingredient_ids = Column(JSON, nullable=True)
+    # Search strategy and time budget used to generate the plan; NULL means random
+    strategy = Column(String, nullable=True)
+    time_budget_ms = Column(Integer, nullable=True)
+
+    # Nutrition totals over all days, kept in sync with meal_plan_day_summary
+    total_calories = Column(Float, default=0.0, index=True)
+    total_protein = Column(Float, default=0.0, index=True)
+    total_carbs = Column(Float, default=0.0)
+    total_fat = Column(Float, default=0.0)
     
     # Relationships
     recipes = relationship("Recipe", secondary=meal_plan_recipe, back_populates="meal_plans")
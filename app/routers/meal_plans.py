@@ -1,12 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException
+import io
+import os
+import csv
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterator, List, Dict, Optional, Tuple, Union
 
 
-from app.db.database import get_db
+from app.db.database import SessionLocal, get_db, get_async_db
 from app.models import models
 from app.schemas import schemas
-from app.services.meal_planner import generate_meal_plan
+from app.services.meal_planner import generate_meal_plan, meal_plan_targets, choose_replacement_meal, plan_violation_score
+from app.services.recipe_catalog import catalog_version
+from app.services.plan_memo import MemoizedPlan, plan_request_key, lookup_plan, remember_plan, forget_meal_plan
+from app.services.plan_engine import (
+    DAYS_PER_WEEK,
+    DEFAULT_TIME_BUDGET_MS,
+    REPRODUCIBLE_STRATEGIES,
+    NoMatchingRecipesError,
+    StrategyUnavailableError,
+    check_strategy,
+)
+from app.services.batch_generation import generate_batch
+from app.services.generation_jobs import QueueFullError, submit_job, get_job
+from app.services.meal_plan_service import (
+    generate_grocery_list,
+    generate_consolidated_grocery_list,
+    grocery_list_query,
+    build_meal_plan,
+    insert_meal_plan_recipes,
+    refresh_meal_plan_rollups,
+    replace_meal_plan_recipe,
+)
+from app.utils.response_cache import meal_plan_cache, cached_json_response
+from app.utils.json_response import JSONBytesResponse, json_response, dump_json
+
+# Rows and plans fetched per round trip by the streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+EXPORT_PLAN_BATCH_SIZE = int(os.getenv("EXPORT_PLAN_BATCH_SIZE", "50"))
 
 router = APIRouter(
     prefix="/meal-plans",
@@ -16,156 +50,283 @@ router = APIRouter(
 
 @router.post("/", response_model=schemas.MealPlanResponse)
 def create_meal_plan(meal_plan: schemas.MealPlanCreate, db: Session = Depends(get_db)):
-    # Create the meal plan in the database
-    db_meal_plan = models.MealPlan(
-        name=meal_plan.name,
-        daily_calories=meal_plan.daily_calories,
-        daily_protein=meal_plan.daily_protein,
-        min_carbs=meal_plan.min_carbs,
-        max_carbs=meal_plan.max_carbs,
-        min_fat=meal_plan.min_fat,
-        max_fat=meal_plan.max_fat,
-        num_people=meal_plan.num_people,
-        error_margin=meal_plan.error_margin,
-        max_repeating_days=meal_plan.max_repeating_days,
-        allow_cheat_meal=meal_plan.allow_cheat_meal
-    )
+    check_strategies_available([meal_plan])
+    db_meal_plan = build_meal_plan(meal_plan)
+
+    # A seeded request fully determines its plan, so identical ones are looked up instead of regenerated;
+    # milp plans depend on how far the solver gets in time, so they are always generated afresh
+    memo_key = memoized = None
+    if meal_plan.seed is not None and meal_plan.strategy in REPRODUCIBLE_STRATEGIES:
+        memo_key = plan_request_key(meal_plan_targets(db_meal_plan), meal_plan.seed, catalog_version())
+        memoized = lookup_plan(memo_key)
+    if memoized is not None and (memoized.name, memoized.num_people) == (meal_plan.name, meal_plan.num_people):
+        existing = db.get(models.MealPlan, memoized.meal_plan_id)
+        if existing is not None:
+            return json_response(schemas.MealPlanResponse, format_meal_plans(db, [existing])[0])
+
+    # Create the meal plan in the database, flushing only to get its id
     db.add(db_meal_plan)
+    db.flush()
+
+    # Write the plan and all of its assignments in one transaction
+    assignments = list(memoized.assignments) if memoized is not None else generate_recipes_for(db_meal_plan, db)
+    insert_meal_plan_recipes(db, {db_meal_plan.id: assignments})
+    refresh_meal_plan_rollups(db, [db_meal_plan.id])
     db.commit()
-    db.refresh(db_meal_plan)
-    
-    # Generate the meal plan recipes
-    meal_plan_recipes = generate_meal_plan(
-        db_meal_plan.id,
-        db_meal_plan.daily_calories,
-        db_meal_plan.daily_protein,
-        db_meal_plan.min_carbs,
-        db_meal_plan.max_carbs,
-        db_meal_plan.min_fat,
-        db_meal_plan.max_fat,
-        db_meal_plan.error_margin,
-        db_meal_plan.max_repeating_days,
-        db_meal_plan.allow_cheat_meal,
-        db
-    )
-    
-    for recipe_assignment in meal_plan_recipes:
-       db.execute(
-            models.meal_plan_recipe.insert().values(
-                meal_plan_id=db_meal_plan.id,
-                recipe_id=recipe_assignment["recipe_id"],
-                day=recipe_assignment["day"],
-                meal_type=recipe_assignment["meal_type"]
-            )
-        )
-    db.commit()
-    
-    return get_formatted_meal_plan(db_meal_plan.id, db)
 
-@router.get("/{meal_plan_id}", response_model=schemas.MealPlanResponse)
-def read_meal_plan(meal_plan_id: int, db: Session = Depends(get_db)):
+    if memo_key is not None:
+        remember_plan(memo_key, MemoizedPlan(tuple(assignments), db_meal_plan.id, meal_plan.name, meal_plan.num_people))
+    return json_response(schemas.MealPlanResponse, format_meal_plans(db, [db_meal_plan])[0])
+
+@router.post("/batch", response_model=List[schemas.MealPlanResponse])
+def create_meal_plans(
+    meal_plans: List[schemas.MealPlanCreate],
+    seed: Optional[int] = Query(default=None, ge=0, le=schemas.MAX_SEED, description="Seed that makes the whole batch reproducible"),
+    workers: Optional[int] = Query(default=None, ge=1, description="Worker processes to use (defaults to the number of cores)"),
+    db: Session = Depends(get_db)
+):
+    check_strategies_available(meal_plans)
+
+    # Create every plan (e.g. one per household), generating large batches across processes
+    try:
+        meal_plan_ids = generate_batch(db, meal_plans, seed, workers)
+    except NoMatchingRecipesError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    # Reload the committed plans with one query instead of refreshing them one by one
+    db_meal_plans = db.query(models.MealPlan).filter(
+        models.MealPlan.id.in_(meal_plan_ids)
+    ).order_by(models.MealPlan.id).all()
+    return json_response(List[schemas.MealPlanResponse], format_meal_plans(db, db_meal_plans))
+
+@router.post("/grocery-list", response_model=schemas.ConsolidatedGroceryList)
+def get_consolidated_grocery_list(shopping: schemas.ConsolidatedGroceryRequest, db: Session = Depends(get_db)):
+    """Merge the grocery lists of several plans (or day ranges of them) for one shopping trip."""
+    meal_plan_ids = [selection.meal_plan_id for selection in shopping.plans]
+    if len(set(meal_plan_ids)) != len(meal_plan_ids):
+        raise HTTPException(status_code=400, detail="Meal plan listed more than once")
+
+    plan_days = dict(db.query(models.MealPlan.id, models.MealPlan.days).filter(models.MealPlan.id.in_(meal_plan_ids)).all())
+    missing = [meal_plan_id for meal_plan_id in meal_plan_ids if meal_plan_id not in plan_days]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Meal plan with id {missing[0]} not found")
+
+    selections = []
+    for selection in shopping.plans:
+        end_day = selection.end_day or plan_days[selection.meal_plan_id] or DAYS_PER_WEEK
+        if end_day < selection.start_day:
+            raise HTTPException(status_code=400, detail=f"end_day is before start_day for meal plan {selection.meal_plan_id}")
+        selections.append((selection.meal_plan_id, selection.start_day, end_day))
+
+    return json_response(schemas.ConsolidatedGroceryList, generate_consolidated_grocery_list(db, selections))
+
+@router.post("/jobs", status_code=202, response_model=schemas.GenerationJobResponse)
+def create_generation_job(
+    meal_plans: List[schemas.MealPlanCreate],
+    response: Response,
+    seed: Optional[int] = Query(default=None, ge=0, le=schemas.MAX_SEED, description="Seed that makes the whole job reproducible"),
+):
+    """Queue plans for background generation and return right away; poll the job for progress."""
+    if not meal_plans:
+        raise HTTPException(status_code=400, detail="No meal plans to generate")
+    check_strategies_available(meal_plans)
+    try:
+        job = submit_job(meal_plans, seed)
+    except QueueFullError:
+        raise HTTPException(status_code=503, detail="Too many generation jobs queued, try again later", headers={"Retry-After": "5"})
+
+    response.headers["Location"] = f"{router.prefix}/jobs/{job.id}"
+    return job.to_dict()
+
+@router.get("/jobs/{job_id}", response_model=schemas.GenerationJobResponse)
+def read_generation_job(job_id: str):
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@router.post("/{meal_plan_id}/generate", response_model=schemas.MealPlanResponse)
+def regenerate_meal_plan(
+    meal_plan_id: int,
+    seed: Optional[int] = Query(default=None, ge=0, le=schemas.MAX_SEED, description="Seed for reproducible generation"),
+    db: Session = Depends(get_db)
+):
     meal_plan = db.query(models.MealPlan).filter(models.MealPlan.id == meal_plan_id).first()
     if meal_plan is None:
         raise HTTPException(status_code=404, detail="Meal plan not found")
-    
-    return get_formatted_meal_plan(meal_plan_id, db)
 
-@router.get("/", response_model=List[schemas.MealPlanResponse])
-def read_meal_plans(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    meal_plans = db.query(models.MealPlan).offset(skip).limit(limit).all()
-    return [get_formatted_meal_plan(meal_plan.id, db) for meal_plan in meal_plans]
+    # Replace all assignments in one transaction
+    meal_plan.seed = seed
+    db.flush()
+    db.execute(models.meal_plan_recipe.delete().where(models.meal_plan_recipe.c.meal_plan_id == meal_plan_id))
+    insert_meal_plan_recipes(db, {meal_plan_id: generate_recipes_for(meal_plan, db)})
+    refresh_meal_plan_rollups(db, [meal_plan_id])
+    db.commit()
+    meal_plan_cache.invalidate_meal_plan(meal_plan_id)
+    forget_meal_plan(meal_plan_id)
 
-def get_formatted_meal_plan(meal_plan_id: int, db: Session):
-    # Get the meal plan
+    return json_response(schemas.MealPlanResponse, format_meal_plans(db, [meal_plan])[0])
+
+@router.patch("/{meal_plan_id}/days/{day}/{meal_type}", response_model=schemas.MealPlanResponse)
+def swap_meal(
+    meal_plan_id: int,
+    day: int,
+    meal_type: schemas.MealTypeEnum,
+    seed: Optional[int] = Query(default=None, ge=0, le=schemas.MAX_SEED, description="Seed for a reproducible choice of recipe"),
+    db: Session = Depends(get_db)
+):
+    """Replace a single meal, adjusting the stored totals instead of regenerating the plan."""
     meal_plan = db.query(models.MealPlan).filter(models.MealPlan.id == meal_plan_id).first()
-    
-    if not meal_plan:
+    if meal_plan is None:
         raise HTTPException(status_code=404, detail="Meal plan not found")
-    
-    # Get recipe assignments using the association table
-    recipe_assignments = db.query(
-        models.meal_plan_recipe.c.day,
-        models.meal_plan_recipe.c.meal_type,
-        models.Recipe
-    ).join(
-        models.Recipe, 
-        models.meal_plan_recipe.c.recipe_id == models.Recipe.id
-    ).filter(
-        models.meal_plan_recipe.c.meal_plan_id == meal_plan_id
-    ).all()
-    
-    # Format meal plan response
-    meals = []
-    total_calories = 0.0
-    total_protein = 0.0
-    total_carbs = 0.0
-    total_fat = 0.0
-    days_set = set()
-    day_stats = {}
-    day_meals = {}
-    
-    # Helper function to get day name
-    def get_day_name(day_number):
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-        return days[(day_number - 1) % 7]
-    
-    # Process all recipe assignments
-    for day, meal_type, recipe in recipe_assignments:
-        # Create meal entry for the response list
-        meal_entry = {
-            "day": day,
-            "meal_type": meal_type,
-            "recipe_id": recipe.id,
-            "recipe_name": recipe.name,
-            "calories": recipe.calories,
-            "protein": recipe.protein,
-            "carbs": recipe.carbs,
-            "fat": recipe.fat,
-            "servings": recipe.servings
-        }
-        meals.append(meal_entry)
-        
-        # Track nutritional info per day
-        if day not in day_stats:
-            day_stats[day] = {
-                "day": day,
-                "day_name": get_day_name(day),
-                "total_calories": 0.0,
-                "total_protein": 0.0,
-                "total_carbs": 0.0,
-                "total_fat": 0.0
-            }
-            day_meals[day] = {
-                "breakfast": None,
-                "lunch": None,
-                "dinner": None,
-                "snack": None
-            }
-        
-        # Add meal to the appropriate meal type for this day
-        day_meals[day][meal_type] = meal_entry
-        
-        days_set.add(day)
-        day_stats[day]["total_calories"] += recipe.calories
-        day_stats[day]["total_protein"] += recipe.protein
-        day_stats[day]["total_carbs"] += recipe.carbs
-        day_stats[day]["total_fat"] += recipe.fat
-        
-        # Track overall totals
-        total_calories += recipe.calories
-        total_protein += recipe.protein
-        total_carbs += recipe.carbs
-        total_fat += recipe.fat
-    
-    # Format days as a list of objects
-    days = []
-    for day_number in sorted(days_set):
-        day_data = day_stats[day_number].copy()
-        # Add meal type fields
-        day_data.update(day_meals[day_number])
-        days.append(day_data)
-    
-    # Return formatted response
+
+    try:
+        swap = choose_replacement_meal(db, meal_plan, day, meal_type.value, seed)
+    except NoMatchingRecipesError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if swap is None:
+        raise HTTPException(status_code=404, detail=f"No {meal_type.value} planned on day {day}")
+
+    old_recipe_id, new_recipe_id = swap
+    replace_meal_plan_recipe(db, meal_plan_id, day, meal_type.value, old_recipe_id, new_recipe_id)
+    db.commit()
+    meal_plan_cache.invalidate_meal_plan(meal_plan_id)
+    forget_meal_plan(meal_plan_id)
+
+    return json_response(schemas.MealPlanResponse, format_meal_plans(db, [meal_plan])[0])
+
+def check_strategies_available(meal_plans: List[schemas.MealPlanCreate]) -> None:
+    # Reject plans whose solver is not installed before anything is written or queued
+    try:
+        for meal_plan in meal_plans:
+            check_strategy(meal_plan.strategy)
+    except StrategyUnavailableError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def generate_recipes_for(db_meal_plan: models.MealPlan, db: Session) -> List[Dict]:
+    # Generate the meal plan recipes
+    try:
+        return generate_meal_plan(
+            db_meal_plan.id,
+            db_meal_plan.daily_calories,
+            db_meal_plan.daily_protein,
+            db_meal_plan.min_carbs,
+            db_meal_plan.max_carbs,
+            db_meal_plan.min_fat,
+            db_meal_plan.max_fat,
+            db_meal_plan.error_margin,
+            db_meal_plan.max_repeating_days,
+            db_meal_plan.allow_cheat_meal,
+            db_meal_plan.days or DAYS_PER_WEEK,
+            db,
+            seed=db_meal_plan.seed,
+            include_ingredient_ids=db_meal_plan.include_ingredient_ids or (),
+            exclude_ingredient_ids=db_meal_plan.exclude_ingredient_ids or (),
+            strategy=db_meal_plan.strategy or "random",
+            time_budget_ms=db_meal_plan.time_budget_ms or DEFAULT_TIME_BUDGET_MS
+        )
+    # Stored plans can ask for a solver that has since been uninstalled
+    except (NoMatchingRecipesError, StrategyUnavailableError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/export.ndjson")
+def export_meal_plans():
+    """Stream every meal plan as NDJSON, one plan per line."""
+    return StreamingResponse(
+        iter_meal_plan_export(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="meal-plans.ndjson"'}
+    )
+
+def iter_meal_plan_export() -> Iterator[bytes]:
+    # The response outlives the request's session, so the generator owns its own
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            # Keyset batches keep memory flat however many plans there are
+            meal_plans = db.query(models.MealPlan).filter(
+                models.MealPlan.id > last_id
+            ).order_by(models.MealPlan.id).limit(EXPORT_PLAN_BATCH_SIZE).all()
+            if not meal_plans:
+                return
+            last_id = meal_plans[-1].id
+            yield b"".join(
+                dump_json(schemas.MealPlanResponse, formatted) + b"\n"
+                for formatted in format_meal_plans(db, meal_plans)
+            )
+            db.expunge_all()
+    finally:
+        db.close()
+
+def render_meal_plans(schema, format_function, meal_plans: List[models.MealPlan]) -> Tuple[List[Dict], bytes]:
+    """Format and serialize plans with a short-lived session of their own; meant to run in the threadpool."""
+    db = SessionLocal()
+    try:
+        formatted = format_function(db, meal_plans)
+        return formatted, dump_json(schema, formatted)
+    finally:
+        db.close()
+
+@router.get("/{meal_plan_id}", response_model=schemas.MealPlanResponse)
+async def read_meal_plan(meal_plan_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Cache hits are answered on the event loop; formatting and serializing a miss is CPU-bound,
+    # so it runs in the threadpool
+    cached = meal_plan_cache.get("meal_plan", meal_plan_id)
+    if cached is None:
+        generation = meal_plan_cache.generation
+        meal_plan = await db.get(models.MealPlan, meal_plan_id)
+        if meal_plan is None:
+            raise HTTPException(status_code=404, detail="Meal plan not found")
+
+        formatted, body = await run_in_threadpool(render_meal_plans, schemas.MealPlanResponse, format_meal_plan, [meal_plan])
+        recipe_ids = {meal["recipe_id"] for meal in formatted["meals"]}
+        cached = meal_plan_cache.put("meal_plan", meal_plan_id, body, recipe_ids, generation)
+
+    return cached_json_response(request, cached)
+
+def format_meal_plan(db: Session, meal_plans: List[models.MealPlan]) -> Dict:
+    return format_meal_plans(db, meal_plans)[0]
+
+@router.get("/", response_model=List[Union[schemas.MealPlanResponse, schemas.MealPlanSummary]])
+async def read_meal_plans(
+    skip: int = 0,
+    limit: int = 100,
+    summary: bool = False,
+    sort_by: schemas.MealPlanSortField = schemas.MealPlanSortField.id,
+    descending: bool = False,
+    min_total_calories: Optional[float] = None,
+    max_total_calories: Optional[float] = None,
+    min_total_protein: Optional[float] = None,
+    max_total_protein: Optional[float] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Totals are stored on the plan rows, so sorting and filtering never touches the meals
+    query = select(models.MealPlan)
+    if min_total_calories is not None:
+        query = query.where(models.MealPlan.total_calories >= min_total_calories)
+    if max_total_calories is not None:
+        query = query.where(models.MealPlan.total_calories <= max_total_calories)
+    if min_total_protein is not None:
+        query = query.where(models.MealPlan.total_protein >= min_total_protein)
+    if max_total_protein is not None:
+        query = query.where(models.MealPlan.total_protein <= max_total_protein)
+
+    sort_column = getattr(models.MealPlan, sort_by.value)
+    query = query.order_by(sort_column.desc() if descending else sort_column, models.MealPlan.id)
+    meal_plans = (await db.scalars(query.offset(skip).limit(limit))).all()
+    # Validate and encode once, in the threadpool, instead of letting FastAPI re-validate the nested dicts
+    if summary:
+        _, body = await run_in_threadpool(render_meal_plans, List[schemas.MealPlanSummary], summarize_meal_plans, meal_plans)
+    else:
+        _, body = await run_in_threadpool(render_meal_plans, List[schemas.MealPlanResponse], format_meal_plans, meal_plans)
+    return JSONBytesResponse(content=body)
+
+def get_day_name(day_number: int) -> str:
+    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+    return days[(day_number - 1) % 7]
+
+def meal_plan_fields(meal_plan) -> Dict:
     return {
         "id": meal_plan.id,
         "name": meal_plan.name,
@@ -179,58 +340,181 @@ def get_formatted_meal_plan(meal_plan_id: int, db: Session):
         "error_margin": meal_plan.error_margin,
         "max_repeating_days": meal_plan.max_repeating_days,
         "allow_cheat_meal": meal_plan.allow_cheat_meal,
-        "meals": meals,
-        "days": days,
-        "total_calories": total_calories,
-        "total_protein": total_protein,
-        "total_carbs": total_carbs,
-        "total_fat": total_fat
+        "num_days": meal_plan.days or 0,
+        "seed": meal_plan.seed,
+        "include_ingredient_ids": meal_plan.include_ingredient_ids or [],
+        "exclude_ingredient_ids": meal_plan.exclude_ingredient_ids or [],
+        "strategy": meal_plan.strategy or "random",
+        "time_budget_ms": meal_plan.time_budget_ms or DEFAULT_TIME_BUDGET_MS
     }
 
-@router.get("/{meal_plan_id}/grocery-list", response_model=schemas.GroceryList)
-def get_grocery_list(meal_plan_id: int, db: Session = Depends(get_db)):
-    # Check if meal plan exists
-    meal_plan = db.query(models.MealPlan).filter(models.MealPlan.id == meal_plan_id).first()
-    if meal_plan is None:
-        raise HTTPException(status_code=404, detail="Meal plan not found")
-    
-    # Get all recipes in the meal plan
+def plan_totals(meal_plan) -> Dict:
+    return {
+        "total_calories": meal_plan.total_calories or 0.0,
+        "total_protein": meal_plan.total_protein or 0.0,
+        "total_carbs": meal_plan.total_carbs or 0.0,
+        "total_fat": meal_plan.total_fat or 0.0
+    }
+
+def format_meal_plans(db: Session, meal_plans: List[models.MealPlan]) -> List[Dict]:
+    """Format several meal plans from their stored rollups and one assignment query."""
+    if not meal_plans:
+        return []
+    meal_plan_ids = [meal_plan.id for meal_plan in meal_plans]
+
+    # Format meal plan responses; overall totals are stored on the plan
+    responses = {}
+    for meal_plan in meal_plans:
+        responses[meal_plan.id] = {
+            **meal_plan_fields(meal_plan),
+            **plan_totals(meal_plan),
+            "meals": [],
+            "days": {}
+        }
+
+    def new_day(day, calories=0.0, protein=0.0, carbs=0.0, fat=0.0):
+        return {
+            "day": day,
+            "day_name": get_day_name(day),
+            "breakfast": None,
+            "lunch": None,
+            "dinner": None,
+            "snack": None,
+            "total_calories": calories,
+            "total_protein": protein,
+            "total_carbs": carbs,
+            "total_fat": fat
+        }
+
+    # Day totals come from the materialized summary table
+    day_summaries = db.query(models.meal_plan_day_summary).filter(
+        models.meal_plan_day_summary.c.meal_plan_id.in_(meal_plan_ids)
+    ).all()
+    day_totals = {meal_plan_id: [] for meal_plan_id in meal_plan_ids}
+    for meal_plan_id, day, calories, protein, carbs, fat in day_summaries:
+        responses[meal_plan_id]["days"][day] = new_day(day, calories, protein, carbs, fat)
+        day_totals[meal_plan_id].append((calories, protein, carbs, fat))
+    for meal_plan in meal_plans:
+        responses[meal_plan.id]["violation_score"] = plan_violation_score(meal_plan, day_totals[meal_plan.id])
+
+    # Get the recipe assignments of every plan using the association table
     recipe_assignments = db.query(
-        models.meal_plan_recipe.c.recipe_id
+        models.meal_plan_recipe.c.meal_plan_id,
+        models.meal_plan_recipe.c.day,
+        models.meal_plan_recipe.c.meal_type,
+        models.Recipe.id,
+        models.Recipe.name,
+        models.Recipe.calories,
+        models.Recipe.protein,
+        models.Recipe.carbs,
+        models.Recipe.fat,
+        models.Recipe.servings
+    ).join(
+        models.Recipe, 
+        models.meal_plan_recipe.c.recipe_id == models.Recipe.id
     ).filter(
-        models.meal_plan_recipe.c.meal_plan_id == meal_plan_id
+        models.meal_plan_recipe.c.meal_plan_id.in_(meal_plan_ids)
     ).all()
-    
-    recipe_ids = [assignment[0] for assignment in recipe_assignments]
-    
-    # Get all ingredients for these recipes
-    ingredients = {}
-    
-    for recipe_id in recipe_ids:
-        recipe_ingredients = db.query(
-            models.recipe_ingredient.c.ingredient_id,
-            models.recipe_ingredient.c.amount,
-            models.recipe_ingredient.c.unit,
-            models.Ingredient.name
-        ).join(
-            models.Ingredient,
-            models.recipe_ingredient.c.ingredient_id == models.Ingredient.id
-        ).filter(
-            models.recipe_ingredient.c.recipe_id == recipe_id
-        ).all()
-        
-        for ing_id, amount, unit, name in recipe_ingredients:
-            key = f"{ing_id}:{unit}"
-            if key not in ingredients:
-                ingredients[key] = {
-                    "ingredient_name": name,
-                    "total_amount": 0,
-                    "unit": unit
-                }
-            # Scale by number of people
-            ingredients[key]["total_amount"] += amount * meal_plan.num_people
-    
-    return {
-        "meal_plan_id": meal_plan_id,
-        "items": list(ingredients.values())
-    }
\ No newline at end of file
+
+    # Place every meal in its day slot in a single pass
+    for meal_plan_id, day, meal_type, recipe_id, name, calories, protein, carbs, fat, servings in recipe_assignments:
+        response = responses[meal_plan_id]
+        meal_entry = {
+            "day": day,
+            "meal_type": meal_type,
+            "recipe_id": recipe_id,
+            "recipe_name": name,
+            "calories": calories or 0.0,
+            "protein": protein or 0.0,
+            "carbs": carbs or 0.0,
+            "fat": fat or 0.0,
+            "servings": servings
+        }
+        response["meals"].append(meal_entry)
+
+        day_data = response["days"].get(day)
+        if day_data is None:
+            day_data = response["days"][day] = new_day(day)
+        day_data[meal_type] = meal_entry
+
+    # Format days as a sorted list of objects
+    for response in responses.values():
+        response["days"] = [response["days"][day] for day in sorted(response["days"])]
+
+    return [responses[meal_plan.id] for meal_plan in meal_plans]
+
+def summarize_meal_plans(db: Session, meal_plans: List[models.MealPlan]) -> List[Dict]:
+    """Return plan settings and stored nutrition totals without the per-meal payload."""
+    day_totals = {meal_plan.id: [] for meal_plan in meal_plans}
+    day_summaries = db.query(models.meal_plan_day_summary).filter(
+        models.meal_plan_day_summary.c.meal_plan_id.in_(list(day_totals))
+    ).all()
+    for meal_plan_id, _, calories, protein, carbs, fat in day_summaries:
+        day_totals[meal_plan_id].append((calories, protein, carbs, fat))
+
+    return [
+        {
+            **meal_plan_fields(meal_plan),
+            **plan_totals(meal_plan),
+            "violation_score": plan_violation_score(meal_plan, day_totals[meal_plan.id])
+        } for meal_plan in meal_plans
+    ]
+
+@router.get("/{meal_plan_id}/grocery-list", response_model=schemas.GroceryList)
+async def get_grocery_list(meal_plan_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    cached = meal_plan_cache.get("grocery_list", meal_plan_id)
+    if cached is None:
+        generation = meal_plan_cache.generation
+        # Check if meal plan exists
+        meal_plan = await db.get(models.MealPlan, meal_plan_id)
+        if meal_plan is None:
+            raise HTTPException(status_code=404, detail="Meal plan not found")
+
+        grocery_list = await db.run_sync(generate_grocery_list, meal_plan)
+        recipe_ids = (await db.scalars(
+            select(models.meal_plan_recipe.c.recipe_id).distinct().where(
+                models.meal_plan_recipe.c.meal_plan_id == meal_plan_id
+            )
+        )).all()
+        cached = meal_plan_cache.put(
+            "grocery_list", meal_plan_id, grocery_list.model_dump_json().encode(), recipe_ids, generation
+        )
+
+    return cached_json_response(request, cached)
+
+@router.get("/{meal_plan_id}/grocery-list.csv")
+async def export_grocery_list(meal_plan_id: int, db: AsyncSession = Depends(get_async_db)):
+    meal_plan = await db.get(models.MealPlan, meal_plan_id)
+    if meal_plan is None:
+        raise HTTPException(status_code=404, detail="Meal plan not found")
+
+    return StreamingResponse(
+        iter_grocery_list_csv(meal_plan.id, meal_plan.num_people),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="grocery-list-{meal_plan_id}.csv"'}
+    )
+
+def iter_grocery_list_csv(meal_plan_id: int, num_people: int) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(["ingredient_name", "total_amount", "unit"])
+    yield flush()
+
+    db = SessionLocal()
+    try:
+        # Fetch the aggregated rows from the cursor in batches instead of all at once
+        result = db.execute(
+            grocery_list_query(meal_plan_id, num_people).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for rows in result.partitions():
+            writer.writerows((name, total_amount or 0, unit) for name, unit, total_amount in rows)
+            yield flush()
+    finally:
+        db.close()
@@ -1,11 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Dict, Optional
 
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db
 from app.models import models
 from app.schemas import schemas
+from app.services.recipe_catalog import invalidate_catalog
+from app.services.meal_plan_service import refresh_meal_plan_rollups, meal_plan_ids_using_recipes
+from app.services.recipe_search import RecipeFilters, filter_recipes
+from app.services.nutrition import recompute_recipe_macros, recipe_ids_using_ingredient
+from app.services.recipe_service import (
+    build_recipe,
+    build_ingredient,
+    find_missing_ingredient_ids,
+    insert_recipe_ingredients,
+    import_recipe_chunk,
+    import_ingredient_chunk,
+)
 from app.utils.db_utils import retry_on_db_lock
+from app.utils.response_cache import meal_plan_cache
+from app.utils.ndjson import iter_ndjson_chunks
+from app.utils.json_response import JSONBytesResponse, json_response, dump_json
 
 router = APIRouter(
     prefix="/recipes",
@@ -15,56 +33,153 @@ router = APIRouter(
 
 @router.post("/", response_model=schemas.RecipeResponse)
 def create_recipe(recipe: schemas.RecipeCreate, db: Session = Depends(get_db)):
-    db_recipe = models.Recipe(
-        name=recipe.name,
-        description=recipe.description,
-        instructions=recipe.instructions,
-        prep_time=recipe.prep_time,
-        cook_time=recipe.cook_time,
-        servings=recipe.servings,
-        calories=recipe.calories,
-        protein=recipe.protein,
-        carbs=recipe.carbs,
-        fat=recipe.fat
-    )
+    # Check all ingredients with one query before writing anything
+    check_ingredients_exist(recipe, db)
+
+    # Write the recipe and its ingredients in a single transaction
+    db_recipe = build_recipe(recipe)
     db.add(db_recipe)
+    db.flush()
+    insert_recipe_ingredients(db, [(db_recipe.id, recipe)])
+    # Derive the macros from the ingredients when every line can be converted to grams
+    recompute_recipe_macros(db, [db_recipe.id])
     db.commit()
-    
-    # Add ingredients to recipe
-    for ingredient_data in recipe.ingredients:
-        ingredient = db.query(models.Ingredient).filter(models.Ingredient.id == ingredient_data.ingredient_id).first()
-        if not ingredient:
-            db.rollback()
-            raise HTTPException(status_code=404, detail=f"Ingredient with id {ingredient_data.ingredient_id} not found")
-        
-        db.execute(
-            models.recipe_ingredient.insert().values(
-                recipe_id=db_recipe.id,
-                ingredient_id=ingredient_data.ingredient_id,
-                amount=ingredient_data.amount,
-                unit=ingredient_data.unit
-            )
-        )
-    
+    db.refresh(db_recipe)
+
+    # Plan generation must see the new recipe
+    invalidate_catalog()
+    return json_response(schemas.RecipeResponse, format_recipe_response(db_recipe, db))
+
+@router.put("/{recipe_id}", response_model=schemas.RecipeResponse)
+def update_recipe(recipe_id: int, recipe: schemas.RecipeCreate, db: Session = Depends(get_db)):
+    db_recipe = db.query(models.Recipe).filter(models.Recipe.id == recipe_id).first()
+    if db_recipe is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    check_ingredients_exist(recipe, db)
+
+    # Replace the recipe's fields and ingredient lines in one transaction
+    for field, value in recipe.model_dump(exclude={"ingredients"}).items():
+        setattr(db_recipe, field, value)
+    db.execute(models.recipe_ingredient.delete().where(models.recipe_ingredient.c.recipe_id == recipe_id))
+    insert_recipe_ingredients(db, [(recipe_id, recipe)])
+    db.flush()
+    recompute_recipe_macros(db, [recipe_id])
+    # Plans using the recipe have new nutrition totals
+    refresh_meal_plan_rollups(db, meal_plan_ids_using_recipes(db, [recipe_id]))
     db.commit()
     db.refresh(db_recipe)
-    return format_recipe_response(db_recipe, db)
+
+    # Drop everything derived from the old version of the recipe
+    invalidate_catalog()
+    meal_plan_cache.invalidate_recipe(recipe_id)
+    return json_response(schemas.RecipeResponse, format_recipe_response(db_recipe, db))
+
+def check_ingredients_exist(recipe: schemas.RecipeCreate, db: Session) -> None:
+    ingredient_ids = [ingredient_data.ingredient_id for ingredient_data in recipe.ingredients]
+    missing = find_missing_ingredient_ids(db, ingredient_ids)
+    if missing:
+        first_missing = next(ingredient_id for ingredient_id in ingredient_ids if ingredient_id in missing)
+        raise HTTPException(status_code=404, detail=f"Ingredient with id {first_missing} not found")
+    if len(set(ingredient_ids)) != len(ingredient_ids):
+        raise HTTPException(status_code=400, detail="Ingredient listed more than once")
+
+@router.post("/nutrition/recompute", response_model=schemas.NutritionRecomputeResult)
+def recompute_nutrition(db: Session = Depends(get_db)):
+    """Re-derive the macros of every recipe from its ingredients in one vectorized pass."""
+    recipe_ids = recompute_recipe_macros(db)
+    refresh_meal_plan_rollups(db, meal_plan_ids_using_recipes(db, recipe_ids))
+    db.commit()
+
+    invalidate_catalog()
+    meal_plan_cache.clear()
+    return {"updated": len(recipe_ids), "recipe_ids": recipe_ids}
+
+@router.post("/bulk", response_model=schemas.BulkImportResult)
+async def bulk_create_recipes(
+    request: Request,
+    chunk_size: int = Query(default=500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Import recipes from an NDJSON body (one RecipeCreate per line), committing chunk by chunk."""
+    result = {"ids": [], "errors": []}
+    try:
+        async for lines in iter_ndjson_chunks(request, chunk_size):
+            await run_in_threadpool(import_recipe_chunk, db, lines, result)
+    finally:
+        if result["ids"]:
+            invalidate_catalog()
+
+    return {"created": len(result["ids"]), **result}
 
 @router.get("/", response_model=List[schemas.RecipeResponse])
-def read_recipes(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    recipes = db.query(models.Recipe).offset(skip).limit(limit).all()
-    return [format_recipe_response(recipe, db) for recipe in recipes]
+async def read_recipes(
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+    min_calories: Optional[float] = None,
+    max_calories: Optional[float] = None,
+    min_protein: Optional[float] = None,
+    max_protein: Optional[float] = None,
+    min_carbs: Optional[float] = None,
+    max_carbs: Optional[float] = None,
+    min_fat: Optional[float] = None,
+    max_fat: Optional[float] = None,
+    max_total_time: Optional[int] = Query(default=None, description="Maximum prep_time + cook_time in minutes"),
+    name_prefix: Optional[str] = Query(default=None, description="Case-insensitive start of the recipe name"),
+    q: Optional[str] = Query(default=None, description="Words to find in the name, description or instructions"),
+    include_all_ingredient: List[int] = Query(default=[], description="Only recipes containing all of these ingredients"),
+    exclude_ingredient: List[int] = Query(default=[], description="Only recipes containing none of these ingredients"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    filters = RecipeFilters(
+        min_calories=min_calories,
+        max_calories=max_calories,
+        min_protein=min_protein,
+        max_protein=max_protein,
+        min_carbs=min_carbs,
+        max_carbs=max_carbs,
+        min_fat=min_fat,
+        max_fat=max_fat,
+        max_total_time=max_total_time,
+        name_prefix=name_prefix,
+        text=q,
+        include_all_ingredients=tuple(include_all_ingredient),
+        exclude_ingredients=tuple(exclude_ingredient)
+    )
+    recipes = await db.run_sync(list_recipes, skip, limit, after_id, filters)
+    # Validating and serializing a page is CPU-bound, so it runs in the threadpool instead of the event loop
+    body = await run_in_threadpool(dump_json, List[schemas.RecipeResponse], recipes)
+    return JSONBytesResponse(content=body)
 
 @router.get("/{recipe_id}", response_model=schemas.RecipeResponse)
-def read_recipe(recipe_id: int, db: Session = Depends(get_db)):
-    recipe = db.query(models.Recipe).filter(models.Recipe.id == recipe_id).first()
+async def read_recipe(recipe_id: int, db: AsyncSession = Depends(get_async_db)):
+    recipe = await db.get(models.Recipe, recipe_id)
     if recipe is None:
         raise HTTPException(status_code=404, detail="Recipe not found")
-    return format_recipe_response(recipe, db)
+    return json_response(schemas.RecipeResponse, await db.run_sync(lambda session: format_recipe_response(recipe, session)))
+
+def list_recipes(db: Session, skip: int, limit: int, after_id: Optional[int], filters: RecipeFilters = RecipeFilters()) -> List[Dict]:
+    # Filter in the database so clients only download the recipes they asked for
+    query = filter_recipes(db.query(models.Recipe), db, filters).order_by(models.Recipe.id)
+    if after_id is not None:
+        # Keyset pagination: seek past the last id of the previous page instead of scanning an OFFSET
+        query = query.filter(models.Recipe.id > after_id)
+    else:
+        query = query.offset(skip)
+    recipes = query.limit(limit).all()
+
+    # Fetch the ingredients of the whole page in one query
+    ingredients = load_recipe_ingredients([recipe.id for recipe in recipes], db)
+    return [format_recipe_response(recipe, db, ingredients.get(recipe.id, [])) for recipe in recipes]
 
-def format_recipe_response(recipe, db):
-    # Get ingredients with their details
-    ingredients_query = db.query(
+def load_recipe_ingredients(recipe_ids: List[int], db: Session) -> Dict[int, List[Dict]]:
+    """Get the ingredient details of several recipes with a single IN (...) query."""
+    ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+    if not recipe_ids:
+        return ingredients
+
+    rows = db.query(
+        models.recipe_ingredient.c.recipe_id,
         models.recipe_ingredient.c.ingredient_id,
         models.Ingredient.name,
         models.recipe_ingredient.c.amount,
@@ -73,8 +188,22 @@ def format_recipe_response(recipe, db):
         models.Ingredient,
         models.recipe_ingredient.c.ingredient_id == models.Ingredient.id
     ).filter(
-        models.recipe_ingredient.c.recipe_id == recipe.id
+        models.recipe_ingredient.c.recipe_id.in_(recipe_ids)
     ).all()
+
+    for recipe_id, ing_id, name, amount, unit in rows:
+        ingredients[recipe_id].append({
+            "ingredient_id": ing_id,
+            "ingredient_name": name,
+            "amount": amount,
+            "unit": unit
+        })
+    return ingredients
+
+def format_recipe_response(recipe, db, ingredients: Optional[List[Dict]] = None):
+    # Get ingredients with their details unless they were preloaded
+    if ingredients is None:
+        ingredients = load_recipe_ingredients([recipe.id], db)[recipe.id]
     
     # Create the response object
     return {
@@ -89,26 +218,13 @@ def format_recipe_response(recipe, db):
         "protein": recipe.protein,
         "carbs": recipe.carbs,
         "fat": recipe.fat,
-        "ingredients": [
-            {
-                "ingredient_id": ing_id,
-                "ingredient_name": name,
-                "amount": amount,
-                "unit": unit
-            } for ing_id, name, amount, unit in ingredients_query
-        ]
+        "ingredients": ingredients
     }
 
 @router.post("/ingredients/", response_model=schemas.Ingredient)
 @retry_on_db_lock(max_retries=5)
 def create_ingredient(ingredient: schemas.IngredientCreate, db: Session = Depends(get_db)):
-    db_ingredient = models.Ingredient(
-        name=ingredient.name,
-        calories_per_100g=ingredient.calories_per_100g,
-        protein_per_100g=ingredient.protein_per_100g,
-        carbs_per_100g=ingredient.carbs_per_100g,
-        fat_per_100g=ingredient.fat_per_100g
-    )
+    db_ingredient = build_ingredient(ingredient)
     db.add(db_ingredient)
     try:
         db.commit()
@@ -118,7 +234,44 @@ def create_ingredient(ingredient: schemas.IngredientCreate, db: Session = Depend
         raise
     return db_ingredient
 
+@router.put("/ingredients/{ingredient_id}", response_model=schemas.Ingredient)
+def update_ingredient(ingredient_id: int, ingredient: schemas.IngredientCreate, db: Session = Depends(get_db)):
+    db_ingredient = db.query(models.Ingredient).filter(models.Ingredient.id == ingredient_id).first()
+    if db_ingredient is None:
+        raise HTTPException(status_code=404, detail="Ingredient not found")
+
+    for field, value in ingredient.model_dump().items():
+        setattr(db_ingredient, field, value)
+    db.flush()
+
+    # Only the recipes using this ingredient, and the plans using those recipes, change
+    using_ids = recipe_ids_using_ingredient(db, ingredient_id)
+    recipe_ids = recompute_recipe_macros(db, using_ids)
+    refresh_meal_plan_rollups(db, meal_plan_ids_using_recipes(db, recipe_ids))
+    db.commit()
+    db.refresh(db_ingredient)
+
+    # The name shows in every grocery list of these recipes, even where macros could not be derived
+    if using_ids:
+        invalidate_catalog()
+        for recipe_id in using_ids:
+            meal_plan_cache.invalidate_recipe(recipe_id)
+    return db_ingredient
+
+@router.post("/ingredients/bulk", response_model=schemas.BulkImportResult)
+async def bulk_create_ingredients(
+    request: Request,
+    chunk_size: int = Query(default=500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Import ingredients from an NDJSON body (one IngredientCreate per line), committing chunk by chunk."""
+    result = {"ids": [], "errors": []}
+    async for lines in iter_ndjson_chunks(request, chunk_size):
+        await run_in_threadpool(import_ingredient_chunk, db, lines, result)
+
+    return {"created": len(result["ids"]), **result}
+
 @router.get("/ingredients/", response_model=List[schemas.Ingredient])
-def read_ingredients(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    ingredients = db.query(models.Ingredient).offset(skip).limit(limit).all()
-    return ingredients
+async def read_ingredients(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    ingredients = await db.scalars(select(models.Ingredient).offset(skip).limit(limit))
+    return ingredients.all()
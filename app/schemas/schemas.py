@@ -2,12 +2,17 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 from enum import Enum
 
+# Largest seed a SQLite (or Postgres BIGINT) column can store
+MAX_SEED = 2**63 - 1
+
 class IngredientBase(BaseModel):
     name: str
     calories_per_100g: float
     protein_per_100g: float
     carbs_per_100g: float
     fat_per_100g: float
+    grams_per_ml: Optional[float] = Field(default=None, gt=0, description="Density used to convert ml, tsp, tbsp and cups to grams (water if unset)")
+    grams_per_piece: Optional[float] = Field(default=None, gt=0, description="Weight of one piece, needed for recipe lines counted in pieces")
 
 class IngredientCreate(IngredientBase):
     pass
@@ -55,6 +60,25 @@ class RecipeResponse(RecipeBase):
     class Config:
         from_attributes = True
 
+class BulkImportError(BaseModel):
+    line: int
+    detail: str
+
+class BulkImportResult(BaseModel):
+    created: int
+    ids: List[int]
+    errors: List[BulkImportError]
+
+class NutritionRecomputeResult(BaseModel):
+    updated: int
+    recipe_ids: List[int]
+
+class PlanStrategy(str, Enum):
+    random = "random"
+    greedy = "greedy"
+    local_search = "local_search"
+    milp = "milp"
+
 class MealPlanBase(BaseModel):
     name: str
     daily_calories: float
@@ -66,7 +90,12 @@ class MealPlanBase(BaseModel):
     num_people: int = Field(gt=0, description="Number of people this meal plan is for")
     error_margin: float = Field(default=0.1, ge=0, le=0.5, description="Error margin for daily calories and macros (0.1 = 10%)")
     max_repeating_days: int = Field(default=2, ge=1, le=3, description="Maximum number of days to repeat meal combinations")
-    allow_cheat_meal: bool = Field(default=False, description="Whether to allow a cheat meal on Sunday lunch")
+    allow_cheat_meal: bool = Field(default=False, description="Whether to allow a cheat meal on Sunday lunch of every week")
+    seed: Optional[int] = Field(default=None, ge=0, le=MAX_SEED, description="Seed for reproducible generation; identical seeded requests return the same plan")
+    include_ingredient_ids: List[int] = Field(default=[], description="Only use recipes containing at least one of these ingredients")
+    exclude_ingredient_ids: List[int] = Field(default=[], description="Never use recipes containing any of these ingredients (e.g. allergens)")
+    strategy: PlanStrategy = Field(default=PlanStrategy.random, description="How meals are searched: random, greedy, local_search or milp (integer programming, needs scipy)")
+    time_budget_ms: int = Field(default=200, ge=1, le=60000, description="Search time per plan for greedy, local_search and milp, in milliseconds; seeded greedy and local_search plans spend it as a fixed amount of work so they stay reproducible")
 
 class MealTypeEnum(str, Enum):
     breakfast = "breakfast"
@@ -75,7 +104,7 @@ class MealTypeEnum(str, Enum):
     snack = "snack"
 
 class MealPlanCreate(MealPlanBase):
-    pass
+    num_days: int = Field(default=7, ge=1, le=366, description="Number of days to plan (e.g. 28 or 90 for multi-week programs)")
 
 class MealPlanRecipe(BaseModel):
     recipe_id: int
@@ -96,6 +125,8 @@ class DayMeals(BaseModel):
 
 class MealPlanResponse(MealPlanBase):
     id: int
+    num_days: int
+    violation_score: float = Field(description="Relative distance of the days' totals outside the targets, summed over days; 0 means every day is within the error margin")
     days: List[DayMeals]
     total_calories: float
     total_protein: float
@@ -105,6 +136,26 @@ class MealPlanResponse(MealPlanBase):
     class Config:
         from_attributes = True
 
+class MealPlanSortField(str, Enum):
+    id = "id"
+    name = "name"
+    total_calories = "total_calories"
+    total_protein = "total_protein"
+    total_carbs = "total_carbs"
+    total_fat = "total_fat"
+
+class MealPlanSummary(MealPlanBase):
+    id: int
+    num_days: int
+    violation_score: float
+    total_calories: float
+    total_protein: float
+    total_carbs: float
+    total_fat: float
+
+    class Config:
+        from_attributes = True
+
 class GroceryItem(BaseModel):
     ingredient_name: str
     total_amount: float
@@ -113,3 +164,30 @@ class GroceryItem(BaseModel):
 class GroceryList(BaseModel):
     meal_plan_id: int
     items: List[GroceryItem]
+
+class GroceryPlanSelection(BaseModel):
+    meal_plan_id: int
+    start_day: int = Field(default=1, ge=1, description="First day of the plan to shop for")
+    end_day: Optional[int] = Field(default=None, ge=1, description="Last day of the plan to shop for (defaults to the last day)")
+
+class ConsolidatedGroceryRequest(BaseModel):
+    plans: List[GroceryPlanSelection] = Field(min_length=1, max_length=1000)
+
+class ConsolidatedGroceryList(BaseModel):
+    items: List[GroceryItem]
+    plans: List[GroceryList]
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+class GenerationJobResponse(BaseModel):
+    id: str
+    status: JobStatus
+    total: int
+    completed: int
+    progress: float
+    meal_plan_ids: List[int]
+    error: Optional[str] = None
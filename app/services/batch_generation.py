@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.schemas import schemas
+from app.services.meal_planner import meal_plan_targets
+from app.services.meal_plan_service import build_meal_plan, insert_meal_plan_recipes, refresh_meal_plan_rollups
+from app.services.plan_engine import PlanTargets, solve_meal_plan
+from app.services.recipe_catalog import RecipeCatalog, get_catalog
+
+# Below this many plans per worker, starting processes costs more than it saves
+MIN_PLANS_PER_WORKER = int(os.getenv("BATCH_MIN_PLANS_PER_WORKER", "16"))
+
+# Workers start from a clean process instead of forking the server, whose threads could leave
+# locks held in the child; the catalog reaches them through the pool initializer either way
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+_pool_context = multiprocessing.get_context(POOL_START_METHOD)
+if POOL_START_METHOD == "forkserver":
+    # The fork server imports the planner once, so each worker starts without re-importing it
+    _pool_context.set_forkserver_preload([__name__])
+
+# Catalog of the current worker process, set once by the pool initializer
+_worker_catalog: Optional[RecipeCatalog] = None
+
+
+def _init_worker(ids: np.ndarray, macros: np.ndarray, version: int, ingredient_bits: Dict[int, np.ndarray]) -> None:
+    global _worker_catalog
+    _worker_catalog = RecipeCatalog(ids, macros, version, ingredient_bits)
+
+
+def _solve_job(job: Tuple[PlanTargets, np.random.SeedSequence]) -> List[Dict]:
+    targets, seed = job
+    return solve_meal_plan(_worker_catalog, targets, np.random.default_rng(seed), reproducible=True)
+
+
+def job_seeds(seed: Optional[int], count: int) -> List[np.random.SeedSequence]:
+    """Derive independent per-plan seeds; the same `seed` always yields the same plans."""
+    return np.random.SeedSequence(seed).spawn(count)
+
+
+def plan_seeds(meal_plans: List[schemas.MealPlanCreate], seed: Optional[int] = None) -> List[np.random.SeedSequence]:
+    """Use each plan's own seed when it has one, so it generates as it would on its own."""
+    spawned = job_seeds(seed, len(meal_plans))
+    return [
+        spawned[i] if meal_plan.seed is None else np.random.SeedSequence(meal_plan.seed)
+        for i, meal_plan in enumerate(meal_plans)
+    ]
+
+
+def worker_count(num_plans: int, workers: Optional[int] = None) -> int:
+    """Number of processes worth starting for a batch, capped by the available cores."""
+    workers = workers or os.cpu_count() or 1
+    return max(1, min(workers, num_plans // MIN_PLANS_PER_WORKER))
+
+
+def generation_pool(catalog: RecipeCatalog, workers: int) -> ProcessPoolExecutor:
+    """Start worker processes that receive the catalog arrays once, at startup."""
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=_pool_context,
+        initializer=_init_worker,
+        initargs=(catalog.ids, catalog.macros, catalog.version, catalog.ingredient_bits)
+    )
+
+
+def generate_assignments(
+    catalog: RecipeCatalog,
+    targets: List[PlanTargets],
+    seeds: List[np.random.SeedSequence],
+    pool: Optional[ProcessPoolExecutor] = None,
+    workers: int = 1
+) -> List[List[Dict]]:
+    """Solve every plan, across the pool's processes when one is given, keeping the input order."""
+    # Every batch plan is seeded, so each one gets the same search wherever it runs
+    if pool is None:
+        return [
+            solve_meal_plan(catalog, plan_targets, np.random.default_rng(seed), reproducible=True)
+            for plan_targets, seed in zip(targets, seeds)
+        ]
+
+    # Send plans in chunks so each round trip carries enough work
+    chunksize = max(1, len(targets) // (workers * 4))
+    return list(pool.map(_solve_job, zip(targets, seeds), chunksize=chunksize))
+
+
+def create_meal_plans(
+    db: Session,
+    meal_plans: List[schemas.MealPlanCreate],
+    seeds: List[np.random.SeedSequence],
+    catalog: Optional[RecipeCatalog] = None,
+    pool: Optional[ProcessPoolExecutor] = None,
+    workers: int = 1
+) -> List[int]:
+    """Insert and generate a batch of plans, writing all rows in one transaction, and return their ids."""
+    if catalog is None:
+        catalog = get_catalog(db)
+
+    db_meal_plans = [build_meal_plan(meal_plan) for meal_plan in meal_plans]
+    db.add_all(db_meal_plans)
+    db.flush()
+    meal_plan_ids = [db_meal_plan.id for db_meal_plan in db_meal_plans]
+
+    assignments = generate_assignments(catalog, [meal_plan_targets(db_meal_plan) for db_meal_plan in db_meal_plans], seeds, pool, workers)
+    insert_meal_plan_recipes(db, dict(zip(meal_plan_ids, assignments)))
+    refresh_meal_plan_rollups(db, meal_plan_ids)
+    db.commit()
+    return meal_plan_ids
+
+
+def generate_batch(
+    db: Session,
+    meal_plans: List[schemas.MealPlanCreate],
+    seed: Optional[int] = None,
+    workers: Optional[int] = None
+) -> List[int]:
+    """Generate a batch of plans, in parallel when it is large enough to pay for the processes."""
+    catalog = get_catalog(db)
+    seeds = plan_seeds(meal_plans, seed)
+    workers = worker_count(len(meal_plans), workers)
+    if workers == 1:
+        return create_meal_plans(db, meal_plans, seeds, catalog)
+
+    with generation_pool(catalog, workers) as pool:
+        return create_meal_plans(db, meal_plans, seeds, catalog, pool, workers)
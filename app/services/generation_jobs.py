@@ -0,0 +1,139 @@
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.db.database import SessionLocal
+from app.schemas import schemas
+from app.services.batch_generation import create_meal_plans, plan_seeds
+
+logger = logging.getLogger(__name__)
+
+# Worker threads generating queued plans
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Jobs waiting for a worker before new submissions are refused
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+# Finished jobs kept for status polling
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", "1000"))
+# Plans written per transaction, and so per progress update
+JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "50"))
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is full and the caller should retry later."""
+
+
+class GenerationJob:
+    """Progress of one background request to generate meal plans."""
+
+    def __init__(self, meal_plans: List[schemas.MealPlanCreate], seed: Optional[int]):
+        self.id = uuid.uuid4().hex
+        self.meal_plans = meal_plans
+        self.seed = seed
+        self.status = schemas.JobStatus.queued
+        self.total = len(meal_plans)
+        self.meal_plan_ids: List[int] = []
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "completed": len(self.meal_plan_ids),
+            "progress": len(self.meal_plan_ids) / self.total if self.total else 1.0,
+            "meal_plan_ids": list(self.meal_plan_ids),
+            "error": self.error
+        }
+
+
+_lock = threading.Lock()
+_jobs: "OrderedDict[str, GenerationJob]" = OrderedDict()
+_queue: "queue.Queue[Optional[GenerationJob]]" = queue.Queue(maxsize=JOB_QUEUE_SIZE)
+_workers: List[threading.Thread] = []
+
+
+def submit_job(meal_plans: List[schemas.MealPlanCreate], seed: Optional[int] = None) -> GenerationJob:
+    """Queue plans for generation, or raise QueueFullError to push back on the caller."""
+    start_workers()
+    job = GenerationJob(meal_plans, seed)
+    with _lock:
+        _jobs[job.id] = job
+        _forget_finished_jobs()
+    try:
+        _queue.put_nowait(job)
+    except queue.Full:
+        with _lock:
+            del _jobs[job.id]
+        raise QueueFullError()
+    return job
+
+
+def get_job(job_id: str) -> Optional[GenerationJob]:
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def _forget_finished_jobs() -> None:
+    # Queued and running jobs are never dropped, so the store is bounded by history plus queue size
+    finished = [job.id for job in _jobs.values() if job.finished_at is not None]
+    for job_id in finished[:max(0, len(finished) - JOB_HISTORY_SIZE)]:
+        del _jobs[job_id]
+
+
+def _run_job(job: GenerationJob) -> None:
+    job.status = schemas.JobStatus.running
+    seeds = plan_seeds(job.meal_plans, job.seed)
+    db = SessionLocal()
+    try:
+        for start in range(0, job.total, JOB_CHUNK_SIZE):
+            end = start + JOB_CHUNK_SIZE
+            job.meal_plan_ids.extend(create_meal_plans(db, job.meal_plans[start:end], seeds[start:end]))
+        job.status = schemas.JobStatus.completed
+    except Exception as e:
+        db.rollback()
+        logger.exception("Meal plan generation job %s failed", job.id)
+        job.status = schemas.JobStatus.failed
+        job.error = str(e)
+    finally:
+        db.close()
+        job.meal_plans = []
+        job.finished_at = time.time()
+
+
+def _work() -> None:
+    while True:
+        job = _queue.get()
+        try:
+            if job is None:
+                return
+            _run_job(job)
+        finally:
+            _queue.task_done()
+
+
+def start_workers() -> None:
+    with _lock:
+        if _workers:
+            return
+        for i in range(JOB_WORKERS):
+            worker = threading.Thread(target=_work, name=f"meal-plan-job-{i}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def stop_workers() -> None:
+    """Let the workers finish the queued jobs, then stop them."""
+    with _lock:
+        workers = list(_workers)
+        _workers.clear()
+    for _ in workers:
+        _queue.put(None)
+    for worker in workers:
+        worker.join()
@@ -1,62 +1,272 @@
 from sqlalchemy.orm import Session
-from collections import defaultdict
-from app.models.models import MealPlan, Recipe, Ingredient, meal_plan_recipe, recipe_ingredient
-from app.schemas.schemas import GroceryList, GroceryItem
-from sqlalchemy import select, join
+from typing import List, Dict, Tuple
+from app.models.models import MealPlan, Recipe, Ingredient, meal_plan_recipe, meal_plan_day_summary, recipe_ingredient
+from app.schemas.schemas import GroceryList, GroceryItem, ConsolidatedGroceryList, MealPlanCreate
+from app.services.nutrition import BASE_UNITS, classify_unit
+from sqlalchemy import Integer, and_, column, select, func, update, values
+
+def build_meal_plan(meal_plan: MealPlanCreate) -> MealPlan:
+    """Create an unsaved meal plan row from the request."""
+    return MealPlan(
+        name=meal_plan.name,
+        daily_calories=meal_plan.daily_calories,
+        daily_protein=meal_plan.daily_protein,
+        min_carbs=meal_plan.min_carbs,
+        max_carbs=meal_plan.max_carbs,
+        min_fat=meal_plan.min_fat,
+        max_fat=meal_plan.max_fat,
+        num_people=meal_plan.num_people,
+        error_margin=meal_plan.error_margin,
+        max_repeating_days=meal_plan.max_repeating_days,
+        allow_cheat_meal=meal_plan.allow_cheat_meal,
+        days=meal_plan.num_days,
+        seed=meal_plan.seed,
+        include_ingredient_ids=sorted(set(meal_plan.include_ingredient_ids)),
+        exclude_ingredient_ids=sorted(set(meal_plan.exclude_ingredient_ids)),
+        strategy=meal_plan.strategy.value,
+        time_budget_ms=meal_plan.time_budget_ms
+    )
+
+def insert_meal_plan_recipes(db: Session, assignments_by_plan: Dict[int, List[Dict]]) -> None:
+    """Insert the recipe assignments of one or more plans with a single executemany."""
+    rows = [
+        {
+            "meal_plan_id": meal_plan_id,
+            "recipe_id": assignment["recipe_id"],
+            "day": assignment["day"],
+            "meal_type": assignment["meal_type"]
+        }
+        for meal_plan_id, assignments in assignments_by_plan.items()
+        for assignment in assignments
+    ]
+    if rows:
+        db.execute(meal_plan_recipe.insert(), rows)
+
+def refresh_meal_plan_rollups(db: Session, meal_plan_ids: List[int]) -> None:
+    """Recompute the stored day and plan nutrition totals of the given plans with set-based SQL."""
+    if not meal_plan_ids:
+        return
+
+    db.execute(meal_plan_day_summary.delete().where(meal_plan_day_summary.c.meal_plan_id.in_(meal_plan_ids)))
+    day_totals = select(
+        meal_plan_recipe.c.meal_plan_id,
+        meal_plan_recipe.c.day,
+        func.coalesce(func.sum(Recipe.calories), 0.0),
+        func.coalesce(func.sum(Recipe.protein), 0.0),
+        func.coalesce(func.sum(Recipe.carbs), 0.0),
+        func.coalesce(func.sum(Recipe.fat), 0.0)
+    ).join(
+        Recipe, Recipe.id == meal_plan_recipe.c.recipe_id
+    ).where(
+        meal_plan_recipe.c.meal_plan_id.in_(meal_plan_ids)
+    ).group_by(
+        meal_plan_recipe.c.meal_plan_id,
+        meal_plan_recipe.c.day
+    )
+    db.execute(meal_plan_day_summary.insert().from_select(
+        ["meal_plan_id", "day", "total_calories", "total_protein", "total_carbs", "total_fat"],
+        day_totals
+    ))
+
+    def plan_total(column):
+        return select(func.coalesce(func.sum(column), 0.0)).where(
+            meal_plan_day_summary.c.meal_plan_id == MealPlan.id
+        ).scalar_subquery()
+
+    db.execute(
+        update(MealPlan).where(MealPlan.id.in_(meal_plan_ids)).values(
+            total_calories=plan_total(meal_plan_day_summary.c.total_calories),
+            total_protein=plan_total(meal_plan_day_summary.c.total_protein),
+            total_carbs=plan_total(meal_plan_day_summary.c.total_carbs),
+            total_fat=plan_total(meal_plan_day_summary.c.total_fat)
+        ).execution_options(synchronize_session=False)
+    )
+
+    # Loaded plans must not keep showing the old totals
+    refreshed = set(meal_plan_ids)
+    for (model, identity, _), instance in list(db.identity_map.items()):
+        if model is MealPlan and identity[0] in refreshed:
+            db.expire(instance)
+
+def replace_meal_plan_recipe(
+    db: Session,
+    meal_plan_id: int,
+    day: int,
+    meal_type: str,
+    old_recipe_id: int,
+    new_recipe_id: int
+) -> None:
+    """Swap the recipe of one meal and shift the stored day and plan totals by the difference."""
+    db.execute(
+        update(meal_plan_recipe).where(
+            meal_plan_recipe.c.meal_plan_id == meal_plan_id,
+            meal_plan_recipe.c.day == day,
+            meal_plan_recipe.c.meal_type == meal_type,
+            meal_plan_recipe.c.recipe_id == old_recipe_id
+        ).values(recipe_id=new_recipe_id)
+    )
+
+    macros = {
+        recipe_id: [value or 0.0 for value in values]
+        for recipe_id, *values in db.query(
+            Recipe.id, Recipe.calories, Recipe.protein, Recipe.carbs, Recipe.fat
+        ).filter(Recipe.id.in_([old_recipe_id, new_recipe_id]))
+    }
+    old, new = macros.get(old_recipe_id, [0.0] * 4), macros.get(new_recipe_id, [0.0] * 4)
+    calories, protein, carbs, fat = (new_value - old_value for new_value, old_value in zip(new, old))
+
+    db.execute(
+        update(meal_plan_day_summary).where(
+            meal_plan_day_summary.c.meal_plan_id == meal_plan_id,
+            meal_plan_day_summary.c.day == day
+        ).values(
+            total_calories=meal_plan_day_summary.c.total_calories + calories,
+            total_protein=meal_plan_day_summary.c.total_protein + protein,
+            total_carbs=meal_plan_day_summary.c.total_carbs + carbs,
+            total_fat=meal_plan_day_summary.c.total_fat + fat
+        )
+    )
+    db.execute(
+        update(MealPlan).where(MealPlan.id == meal_plan_id).values(
+            total_calories=func.coalesce(MealPlan.total_calories, 0.0) + calories,
+            total_protein=func.coalesce(MealPlan.total_protein, 0.0) + protein,
+            total_carbs=func.coalesce(MealPlan.total_carbs, 0.0) + carbs,
+            total_fat=func.coalesce(MealPlan.total_fat, 0.0) + fat
+        ).execution_options(synchronize_session="fetch")
+    )
+
+def meal_plan_ids_using_recipes(db: Session, recipe_ids: List[int]) -> List[int]:
+    if not recipe_ids:
+        return []
+    return list(db.scalars(
+        select(meal_plan_recipe.c.meal_plan_id).distinct().where(meal_plan_recipe.c.recipe_id.in_(recipe_ids))
+    ))
+
+def grocery_list_query(meal_plan_id: int, num_people: int):
+    """Select (ingredient name, unit, total amount) rows of a plan's grocery list, sorted by name."""
+    # Count how often each distinct recipe appears so its ingredients are fetched once
+    recipe_counts = select(
+        meal_plan_recipe.c.recipe_id,
+        func.count().label("times_used")
+    ).where(
+        meal_plan_recipe.c.meal_plan_id == meal_plan_id
+    ).group_by(
+        meal_plan_recipe.c.recipe_id
+    ).subquery()
+
+    # Ingredient amounts are per recipe, so scale each meal by num_people / servings
+    servings = func.coalesce(func.nullif(Recipe.servings, 0), 1)
+    scaled_amount = recipe_ingredient.c.amount * recipe_counts.c.times_used * num_people / servings
+
+    return select(
+        Ingredient.name,
+        recipe_ingredient.c.unit,
+        func.sum(scaled_amount)
+    ).select_from(
+        recipe_counts
+    ).join(
+        Recipe, Recipe.id == recipe_counts.c.recipe_id
+    ).join(
+        recipe_ingredient, recipe_ingredient.c.recipe_id == recipe_counts.c.recipe_id
+    ).join(
+        Ingredient, Ingredient.id == recipe_ingredient.c.ingredient_id
+    ).group_by(
+        Ingredient.id,
+        recipe_ingredient.c.unit
+    ).order_by(
+        Ingredient.name
+    )
 
 def generate_grocery_list(db: Session, meal_plan: MealPlan) -> GroceryList:
-    # Get all recipes in this meal plan
-    query = select([Recipe, meal_plan_recipe.c.day, meal_plan_recipe.c.meal_type]).select_from(
-        join(Recipe, meal_plan_recipe, Recipe.id == meal_plan_recipe.c.recipe_id)
-    ).where(meal_plan_recipe.c.meal_plan_id == meal_plan.id)
-    
-    result = db.execute(query).fetchall()
-    
-    # Build grocery list
-    ingredients_needed = defaultdict(lambda: defaultdict(float))
-    
-    for row in result:
-        recipe, day, meal_type = row
-        
-        # Get ingredients for this recipe
-        ingredient_query = select([
-            Ingredient.id,
-            Ingredient.name,
-            recipe_ingredient.c.amount,
-            recipe_ingredient.c.unit
-        ]).select_from(
-            join(Ingredient, recipe_ingredient, Ingredient.id == recipe_ingredient.c.ingredient_id)
-        ).where(recipe_ingredient.c.recipe_id == recipe.id)
-        
-        ingredients = db.execute(ingredient_query).fetchall()
-        
-        # Scale by number of people and add to tracking
-        for ingredient in ingredients:
-            ingredient_id, ingredient_name, amount, unit = ingredient
-            
-            # Scale by number of people
-            scaled_amount = amount * meal_plan.num_people / recipe.servings
-            
-            # Add to tracking
-            ingredients_needed[ingredient_name][unit] += scaled_amount
-    
-    # Convert to output format
-    grocery_items = []
-    for ingredient_name, units in ingredients_needed.items():
-        for unit, amount in units.items():
-            grocery_items.append(
-                GroceryItem(
-                    ingredient_name=ingredient_name,
-                    total_amount=amount,
-                    unit=unit
-                )
-            )
-    
+    query = grocery_list_query(meal_plan.id, meal_plan.num_people)
+    grocery_items = [
+        GroceryItem(
+            ingredient_name=ingredient_name,
+            total_amount=total_amount or 0,
+            unit=unit
+        ) for ingredient_name, unit, total_amount in db.execute(query)
+    ]
+
     return GroceryList(
         meal_plan_id=meal_plan.id,
         items=grocery_items
     )
 
+def consolidated_grocery_query(selections: List[Tuple[int, int, int]]):
+    """Select (meal_plan_id, ingredient_id, name, unit, total amount) for several plans' day ranges in one grouped query."""
+    # The selections become a literal table, so the query stays flat however many plans there are
+    selection = values(
+        column("meal_plan_id", Integer),
+        column("start_day", Integer),
+        column("end_day", Integer),
+        name="selection"
+    ).data(selections).cte("selection")
+
+    # Count each recipe's uses inside the selected days of every plan
+    recipe_counts = select(
+        meal_plan_recipe.c.meal_plan_id,
+        meal_plan_recipe.c.recipe_id,
+        func.count().label("times_used")
+    ).join(
+        selection,
+        and_(
+            selection.c.meal_plan_id == meal_plan_recipe.c.meal_plan_id,
+            meal_plan_recipe.c.day.between(selection.c.start_day, selection.c.end_day)
+        )
+    ).group_by(
+        meal_plan_recipe.c.meal_plan_id,
+        meal_plan_recipe.c.recipe_id
+    ).subquery()
+
+    servings = func.coalesce(func.nullif(Recipe.servings, 0), 1)
+    scaled_amount = recipe_ingredient.c.amount * recipe_counts.c.times_used * MealPlan.num_people / servings
+
+    return select(
+        recipe_counts.c.meal_plan_id,
+        Ingredient.id,
+        Ingredient.name,
+        recipe_ingredient.c.unit,
+        func.sum(scaled_amount)
+    ).select_from(
+        recipe_counts
+    ).join(
+        MealPlan, MealPlan.id == recipe_counts.c.meal_plan_id
+    ).join(
+        Recipe, Recipe.id == recipe_counts.c.recipe_id
+    ).join(
+        recipe_ingredient, recipe_ingredient.c.recipe_id == recipe_counts.c.recipe_id
+    ).join(
+        Ingredient, Ingredient.id == recipe_ingredient.c.ingredient_id
+    ).group_by(
+        recipe_counts.c.meal_plan_id,
+        Ingredient.id,
+        recipe_ingredient.c.unit
+    )
+
+def generate_consolidated_grocery_list(db: Session, selections: List[Tuple[int, int, int]]) -> ConsolidatedGroceryList:
+    """Merge the grocery lists of several (meal_plan_id, start_day, end_day) selections, with a per-plan breakdown."""
+    per_plan = {meal_plan_id: {} for meal_plan_id, _, _ in selections}
+    merged = {}
+    for meal_plan_id, ingredient_id, name, unit, total_amount in db.execute(consolidated_grocery_query(selections)):
+        # Express known units in g, ml or pieces so "Cup", "cups" and "ml" lines add up
+        kind, factor = classify_unit(unit)
+        if kind in BASE_UNITS:
+            unit, total_amount = BASE_UNITS[kind], (total_amount or 0) * factor
+        for items in (per_plan[meal_plan_id], merged):
+            item = items.get((ingredient_id, unit))
+            if item is None:
+                items[(ingredient_id, unit)] = GroceryItem(ingredient_name=name, total_amount=total_amount or 0, unit=unit)
+            else:
+                item.total_amount += total_amount or 0
+
+    def sorted_items(items: Dict) -> List[GroceryItem]:
+        return sorted(items.values(), key=lambda item: (item.ingredient_name, item.unit))
+
+    return ConsolidatedGroceryList(
+        items=sorted_items(merged),
+        plans=[GroceryList(meal_plan_id=meal_plan_id, items=sorted_items(items)) for meal_plan_id, items in per_plan.items()]
+    )
+
 def generate_meal_plan():
     # Implementation of the meal plan generation logic
     pass
@@ -1,9 +1,17 @@
 from sqlalchemy.orm import Session
-from typing import List, Dict
-import random
+from typing import List, Dict, Optional, Sequence, Tuple
+import numpy as np
 
-from app.models import models
-from app.schemas import schemas
+from app.models.models import MealPlan, meal_plan_recipe
+from app.services.plan_engine import (
+    DAYS_PER_WEEK,
+    DEFAULT_TIME_BUDGET_MS,
+    PlanTargets,
+    select_slot_replacement,
+    solve_meal_plan,
+    violation_scores,
+)
+from app.services.recipe_catalog import get_catalog
 
 def generate_meal_plan(
     meal_plan_id: int,
@@ -16,150 +24,93 @@ def generate_meal_plan(
     error_margin: float,
     max_repeating_days: int,
     allow_cheat_meal: bool,
-    db: Session
+    num_days: int,
+    db: Session,
+    seed: Optional[int] = None,
+    include_ingredient_ids: Sequence[int] = (),
+    exclude_ingredient_ids: Sequence[int] = (),
+    strategy: str = "random",
+    time_budget_ms: int = DEFAULT_TIME_BUDGET_MS
 ) -> List[Dict]:
-    """Generate a meal plan for a week with specific nutritional requirements."""
-    # Get all recipes from the database
-    all_recipes = db.query(models.Recipe).all()
-    
-    # Categorize recipes by meal type
-    # This would normally be based on a field in your database
-    # For now, let's use a simple heuristic: calories and time of day
-    breakfast_recipes = [r for r in all_recipes if r.calories < daily_calories * 0.3]
-    lunch_recipes = [r for r in all_recipes if r.calories >= daily_calories * 0.25 and r.calories <= daily_calories * 0.4]
-    dinner_recipes = [r for r in all_recipes if r.calories >= daily_calories * 0.2 and r.calories <= daily_calories * 0.35]
-    snack_recipes = [r for r in all_recipes if r.calories < daily_calories * 0.15]
-    
-    # If not enough recipes in each category, add more from general pool
-    if len(breakfast_recipes) < 7:
-        breakfast_recipes.extend(random.sample(all_recipes, min(7 - len(breakfast_recipes), len(all_recipes))))
-    if len(lunch_recipes) < 7:
-        lunch_recipes.extend(random.sample(all_recipes, min(7 - len(lunch_recipes), len(all_recipes))))
-    if len(dinner_recipes) < 7:
-        dinner_recipes.extend(random.sample(all_recipes, min(7 - len(dinner_recipes), len(all_recipes))))
-    if len(snack_recipes) < 7:
-        snack_recipes.extend(random.sample(all_recipes, min(7 - len(snack_recipes), len(all_recipes))))
-    
-    # Calculate calorie targets with error margin
-    min_calories = daily_calories * (1 - error_margin)
-    max_calories = daily_calories * (1 + error_margin)
-    min_protein = daily_protein * (1 - error_margin)
-    
-    # Create pattern of repeating days based on max_repeating_days
-    day_patterns = []
-    if max_repeating_days == 1:
-        # No repeating days - every day is different
-        day_patterns = [[1], [2], [3], [4], [5], [6], [7]]
-    elif max_repeating_days == 2:
-        # Repeat Mon/Tue, Wed/Thu, Fri/Sat, Sunday unique
-        day_patterns = [[1, 2], [3, 4], [5, 6], [7]]
-    elif max_repeating_days == 3:
-        # Repeat Mon/Tue/Wed, Thu/Fri/Sat, Sunday unique
-        day_patterns = [[1, 2, 3], [4, 5, 6], [7]]
-    
-    # Generate meal plan assignments
-    meal_plan_recipes = []
-    
-    # Create sets to track which recipes are used on which days
-    used_recipes = {
-        "breakfast": set(),
-        "lunch": set(),
-        "dinner": set(),
-        "snack": set()
-    }
-    
-    # Handle the special case for cheat meal
-    cheat_meal_recipe = None
-    if allow_cheat_meal:
-        # Select a recipe for cheat meal that's higher in calories
-        cheat_candidates = [r for r in all_recipes if r.calories > daily_calories * 0.4]
-        if cheat_candidates:
-            cheat_meal_recipe = random.choice(cheat_candidates)
-        else:
-            cheat_meal_recipe = random.choice(all_recipes)  # Fallback
-    
-    # Process each day pattern (group of repeating days)
-    for pattern in day_patterns:
-        # Choose recipes for this pattern
-        selected_breakfast = random.choice([r for r in breakfast_recipes if r.id not in used_recipes["breakfast"]])
-        selected_lunch = random.choice([r for r in lunch_recipes if r.id not in used_recipes["lunch"]])
-        selected_dinner = random.choice([r for r in dinner_recipes if r.id not in used_recipes["dinner"]])
-        selected_snack = random.choice([r for r in snack_recipes if r.id not in used_recipes["snack"]])
-        
-        used_recipes["breakfast"].add(selected_breakfast.id)
-        used_recipes["lunch"].add(selected_lunch.id)
-        used_recipes["dinner"].add(selected_dinner.id)
-        used_recipes["snack"].add(selected_snack.id)
-        
-        # Special case: if this pattern includes Sunday (day 7) and cheat meal is allowed
-        if 7 in pattern and allow_cheat_meal and cheat_meal_recipe:
-            for day in pattern:
-                if day == 7:  # Sunday
-                    # Add breakfast, cheat meal for lunch, dinner and snack
-                    meal_plan_recipes.append({
-                        "recipe_id": selected_breakfast.id,
-                        "day": day,
-                        "meal_type": "breakfast"
-                    })
-                    meal_plan_recipes.append({
-                        "recipe_id": cheat_meal_recipe.id,
-                        "day": day,
-                        "meal_type": "lunch"
-                    })
-                    meal_plan_recipes.append({
-                        "recipe_id": selected_dinner.id,
-                        "day": day,
-                        "meal_type": "dinner"
-                    })
-                    meal_plan_recipes.append({
-                        "recipe_id": selected_snack.id,
-                        "day": day,
-                        "meal_type": "snack"
-                    })
-                else:
-                    # Regular day meals
-                    meal_plan_recipes.append({
-                        "recipe_id": selected_breakfast.id,
-                        "day": day,
-                        "meal_type": "breakfast"
-                    })
-                    meal_plan_recipes.append({
-                        "recipe_id": selected_lunch.id,
-                        "day": day,
-                        "meal_type": "lunch"
-                    })
-                    meal_plan_recipes.append({
-                        "recipe_id": selected_dinner.id,
-                        "day": day,
-                        "meal_type": "dinner"
-                    })
-                    meal_plan_recipes.append({
-                        "recipe_id": selected_snack.id,
-                        "day": day,
-                        "meal_type": "snack"
-                    })
-        else:
-            # Regular days without cheat meal
-            for day in pattern:
-                meal_plan_recipes.append({
-                    "recipe_id": selected_breakfast.id,
-                    "day": day,
-                    "meal_type": "breakfast"
-                })
-                meal_plan_recipes.append({
-                    "recipe_id": selected_lunch.id,
-                    "day": day,
-                    "meal_type": "lunch"
-                })
-                meal_plan_recipes.append({
-                    "recipe_id": selected_dinner.id,
-                    "day": day,
-                    "meal_type": "dinner"
-                })
-                meal_plan_recipes.append({
-                    "recipe_id": selected_snack.id,
-                    "day": day,
-                    "meal_type": "snack"
-                })
-    
-    return meal_plan_recipes
+    """Generate a meal plan for `num_days` days with specific nutritional requirements."""
+    # Use the shared recipe snapshot instead of hydrating every Recipe row
+    catalog = get_catalog(db)
+
+    targets = PlanTargets(
+        daily_calories=daily_calories,
+        daily_protein=daily_protein,
+        min_carbs=min_carbs,
+        max_carbs=max_carbs,
+        min_fat=min_fat,
+        max_fat=max_fat,
+        error_margin=error_margin,
+        max_repeating_days=max_repeating_days,
+        allow_cheat_meal=allow_cheat_meal,
+        num_days=num_days,
+        include_ingredients=tuple(sorted(set(include_ingredient_ids))),
+        exclude_ingredients=tuple(sorted(set(exclude_ingredient_ids))),
+        strategy=strategy,
+        time_budget_ms=time_budget_ms
+    )
+
+    # Score breakfast/lunch/dinner/snack combinations in bulk for each group of days;
+    # a seeded plan searches a fixed amount so that the seed reproduces it
+    return solve_meal_plan(catalog, targets, np.random.default_rng(seed), reproducible=seed is not None)
+
+def meal_plan_targets(meal_plan: MealPlan) -> PlanTargets:
+    """Read the generation constraints of a saved (or flushed) meal plan row."""
+    return PlanTargets(
+        daily_calories=meal_plan.daily_calories,
+        daily_protein=meal_plan.daily_protein,
+        min_carbs=meal_plan.min_carbs,
+        max_carbs=meal_plan.max_carbs,
+        min_fat=meal_plan.min_fat,
+        max_fat=meal_plan.max_fat,
+        error_margin=meal_plan.error_margin,
+        max_repeating_days=meal_plan.max_repeating_days,
+        allow_cheat_meal=meal_plan.allow_cheat_meal,
+        num_days=meal_plan.days or DAYS_PER_WEEK,
+        include_ingredients=tuple(meal_plan.include_ingredient_ids or ()),
+        exclude_ingredients=tuple(meal_plan.exclude_ingredient_ids or ()),
+        strategy=meal_plan.strategy or "random",
+        time_budget_ms=meal_plan.time_budget_ms or DEFAULT_TIME_BUDGET_MS
+    )
+
+def plan_violation_score(meal_plan: MealPlan, day_totals: Sequence[Sequence[float]]) -> float:
+    """Score a plan's (calories, protein, carbs, fat) day totals against its targets; 0 means every day is on target."""
+    lower, upper, scale = meal_plan_targets(meal_plan).bounds()
+    totals = np.array(day_totals, dtype=np.float64).reshape(-1, 4)
+    return float(violation_scores(totals, lower, upper, scale).sum())
+
+def choose_replacement_meal(
+    db: Session,
+    meal_plan: MealPlan,
+    day: int,
+    meal_type: str,
+    seed: Optional[int] = None
+) -> Optional[Tuple[int, int]]:
+    """Pick a new recipe for one meal of a plan; return (old recipe id, new recipe id), or None if the slot is empty."""
+    # Only the day's meals and this meal type's days matter, not the whole plan
+    rows = db.query(
+        meal_plan_recipe.c.recipe_id,
+        meal_plan_recipe.c.day,
+        meal_plan_recipe.c.meal_type
+    ).filter(
+        meal_plan_recipe.c.meal_plan_id == meal_plan.id,
+        (meal_plan_recipe.c.day == day) | (meal_plan_recipe.c.meal_type == meal_type)
+    ).all()
+    day_recipes = {row_meal_type: recipe_id for recipe_id, row_day, row_meal_type in rows if row_day == day}
+    if meal_type not in day_recipes:
+        return None
+    slot_recipes = {row_day: recipe_id for recipe_id, row_day, row_meal_type in rows if row_meal_type == meal_type}
+
+    new_recipe_id, _ = select_slot_replacement(
+        get_catalog(db),
+        meal_plan_targets(meal_plan),
+        day,
+        meal_type,
+        day_recipes,
+        slot_recipes,
+        np.random.default_rng(seed)
+    )
+    return day_recipes[meal_type], new_recipe_id
@@ -0,0 +1,172 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, bindparam
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from app.models import models
+
+# Grams per unit of mass
+MASS_UNITS = {
+    "g": 1.0, "gram": 1.0, "grams": 1.0,
+    "kg": 1000.0, "kilogram": 1000.0, "kilograms": 1000.0,
+    "mg": 0.001,
+    "oz": 28.3495, "ounce": 28.3495, "ounces": 28.3495,
+    "lb": 453.592, "lbs": 453.592, "pound": 453.592, "pounds": 453.592,
+}
+
+# Millilitres per unit of volume; converted to grams with the ingredient's density
+VOLUME_UNITS = {
+    "ml": 1.0, "milliliter": 1.0, "milliliters": 1.0, "millilitre": 1.0, "millilitres": 1.0,
+    "cl": 10.0, "dl": 100.0,
+    "l": 1000.0, "liter": 1000.0, "liters": 1000.0, "litre": 1000.0, "litres": 1000.0,
+    "tsp": 4.92892, "teaspoon": 4.92892, "teaspoons": 4.92892,
+    "tbsp": 14.7868, "tablespoon": 14.7868, "tablespoons": 14.7868,
+    "cup": 240.0, "cups": 240.0,
+    "fl oz": 29.5735,
+}
+
+# Counted units; converted to grams with the ingredient's weight per piece
+PIECE_UNITS = {"piece", "pieces", "pc", "pcs", "whole", "unit", "units", "item", "items"}
+
+# Density used when an ingredient has none (water)
+DEFAULT_GRAMS_PER_ML = 1.0
+
+MASS, VOLUME, PIECE, UNKNOWN = range(4)
+
+# Unit every convertible amount is expressed in, per kind
+BASE_UNITS = {MASS: "g", VOLUME: "ml", PIECE: "piece"}
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    return " ".join((unit or "").lower().replace(".", "").split())
+
+
+def classify_unit(unit: Optional[str]) -> Tuple[int, float]:
+    """Return (kind, factor) for a unit: grams per unit for mass, millilitres for volume."""
+    unit = normalize_unit(unit)
+    if unit in MASS_UNITS:
+        return MASS, MASS_UNITS[unit]
+    if unit in VOLUME_UNITS:
+        return VOLUME, VOLUME_UNITS[unit]
+    if unit in PIECE_UNITS:
+        return PIECE, 1.0
+    return UNKNOWN, np.nan
+
+
+def to_grams(
+    amounts: np.ndarray,
+    units: List[Optional[str]],
+    grams_per_ml: np.ndarray,
+    grams_per_piece: np.ndarray
+) -> np.ndarray:
+    """Convert ingredient lines to grams; lines that cannot be converted become NaN."""
+    unique_units, inverse = np.unique(np.array([normalize_unit(unit) for unit in units], dtype=object), return_inverse=True)
+    classified = [classify_unit(unit) for unit in unique_units]
+    kinds = np.array([kind for kind, _ in classified], dtype=np.int8)[inverse]
+    factors = np.array([factor for _, factor in classified], dtype=np.float64)[inverse]
+
+    grams = amounts * factors
+    grams = np.where(kinds == VOLUME, grams * np.where(np.isnan(grams_per_ml), DEFAULT_GRAMS_PER_ML, grams_per_ml), grams)
+    # Pieces without a known weight stay NaN
+    grams = np.where(kinds == PIECE, grams * grams_per_piece, grams)
+    return grams
+
+
+def compute_recipe_macros(db: Session, recipe_ids: Optional[List[int]] = None) -> Dict[int, Tuple[float, float, float, float]]:
+    """
+    Compute per-serving calories, protein, carbs and fat from the ingredients in one vectorized pass.
+
+    Only recipes whose every ingredient line converts to grams are returned; the others keep
+    their client-supplied values. Pass `recipe_ids` to limit the work to those recipes.
+    """
+    query = select(
+        models.recipe_ingredient.c.recipe_id,
+        models.recipe_ingredient.c.amount,
+        models.recipe_ingredient.c.unit,
+        models.Recipe.servings,
+        models.Ingredient.calories_per_100g,
+        models.Ingredient.protein_per_100g,
+        models.Ingredient.carbs_per_100g,
+        models.Ingredient.fat_per_100g,
+        models.Ingredient.grams_per_ml,
+        models.Ingredient.grams_per_piece
+    ).join(
+        models.Recipe, models.Recipe.id == models.recipe_ingredient.c.recipe_id
+    ).join(
+        models.Ingredient, models.Ingredient.id == models.recipe_ingredient.c.ingredient_id
+    )
+    if recipe_ids is not None:
+        if not recipe_ids:
+            return {}
+        query = query.where(models.recipe_ingredient.c.recipe_id.in_(recipe_ids))
+
+    rows = db.execute(query).all()
+    if not rows:
+        return {}
+
+    line_recipe_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    amounts = np.array([row[1] for row in rows], dtype=np.float64)
+    units = [row[2] for row in rows]
+    servings = np.array([row[3] for row in rows], dtype=np.float64)
+    per_100g = np.nan_to_num(np.array([row[4:8] for row in rows], dtype=np.float64))
+    grams_per_ml = np.array([row[8] for row in rows], dtype=np.float64)
+    grams_per_piece = np.array([row[9] for row in rows], dtype=np.float64)
+
+    grams = to_grams(amounts, units, grams_per_ml, grams_per_piece)
+
+    # Sum the ingredient lines of each recipe
+    unique_recipe_ids, recipe_index = np.unique(line_recipe_ids, return_inverse=True)
+    totals = np.zeros((len(unique_recipe_ids), 4))
+    np.add.at(totals, recipe_index, np.nan_to_num(grams)[:, None] * per_100g / 100.0)
+    unconvertible = np.zeros(len(unique_recipe_ids), dtype=bool)
+    np.logical_or.at(unconvertible, recipe_index, np.isnan(grams))
+
+    recipe_servings = np.zeros(len(unique_recipe_ids))
+    recipe_servings[recipe_index] = servings
+    recipe_servings = np.where(np.isnan(recipe_servings) | (recipe_servings <= 0), 1.0, recipe_servings)
+    per_serving = totals / recipe_servings[:, None]
+
+    return {
+        int(recipe_id): tuple(float(value) for value in macros)
+        for recipe_id, macros, skip in zip(unique_recipe_ids, per_serving, unconvertible)
+        if not skip
+    }
+
+
+def recompute_recipe_macros(db: Session, recipe_ids: Optional[List[int]] = None) -> List[int]:
+    """Store ingredient-derived macros on the recipes and return the ids that were updated."""
+    computed = compute_recipe_macros(db, recipe_ids)
+    if not computed:
+        return []
+
+    recipes = models.Recipe.__table__
+    db.execute(
+        update(recipes).where(recipes.c.id == bindparam("recipe_id")).values(
+            calories=bindparam("new_calories"),
+            protein=bindparam("new_protein"),
+            carbs=bindparam("new_carbs"),
+            fat=bindparam("new_fat")
+        ),
+        [
+            {
+                "recipe_id": recipe_id,
+                "new_calories": calories,
+                "new_protein": protein,
+                "new_carbs": carbs,
+                "new_fat": fat
+            } for recipe_id, (calories, protein, carbs, fat) in computed.items()
+        ]
+    )
+
+    # Loaded recipes must not keep showing the old values
+    updated = set(computed)
+    for (model, identity, _), instance in list(db.identity_map.items()):
+        if model is models.Recipe and identity[0] in updated:
+            db.expire(instance)
+    return list(computed)
+
+
+def recipe_ids_using_ingredient(db: Session, ingredient_id: int) -> List[int]:
+    return list(db.scalars(
+        select(models.recipe_ingredient.c.recipe_id).where(models.recipe_ingredient.c.ingredient_id == ingredient_id)
+    ))
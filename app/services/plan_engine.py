@@ -0,0 +1,547 @@
+import time
+from typing import List, Dict, NamedTuple, Optional, Tuple
+import numpy as np
+
+from app.services.recipe_catalog import RecipeCatalog, CALORIES
+
+try:
+    from scipy.optimize import Bounds, LinearConstraint, milp
+except ImportError:  # scipy is optional; without it the milp strategy is unavailable
+    milp = None
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack"]
+
+DAYS_PER_WEEK = 7
+
+# Number of breakfast/lunch/dinner/snack combinations scored per day group
+CANDIDATES_PER_GROUP = 2048
+
+# Scores at or below this are treated as "inside the error margin"
+FEASIBLE_SCORE = 1e-9
+
+# How each day group's meals are chosen:
+# random samples combinations and picks any feasible one, greedy descends from the best sample,
+# local_search keeps perturbing and descending until the budget runs out, milp solves exactly
+STRATEGIES = ("random", "greedy", "local_search", "milp")
+
+# Strategies whose seeded plans are reproducible; the milp solver can only be stopped by the clock
+REPRODUCIBLE_STRATEGIES = ("random", "greedy", "local_search")
+
+# Search time per plan for the budgeted strategies
+DEFAULT_TIME_BUDGET_MS = 200
+
+# Seeded searches count scored combinations instead of watching the clock; these are calibrated on
+# one core so that a millisecond of budget buys at most about a millisecond of search
+SCORED_COMBINATIONS_PER_MS = 3000
+# Fixed cost of one vectorized scoring pass, in scored combinations
+SCORING_OVERHEAD = 300
+
+# Recipes per meal type the milp strategy hands to the solver
+MILP_CANDIDATES_PER_MEAL = 64
+
+
+class NoMatchingRecipesError(ValueError):
+    """Raised when the ingredient filters leave no recipe to plan with."""
+
+
+class StrategyUnavailableError(ValueError):
+    """Raised when a plan asks for a strategy whose solver is not installed."""
+
+
+def check_strategy(strategy: str) -> None:
+    if strategy == "milp" and milp is None:
+        raise StrategyUnavailableError("The milp strategy needs scipy, which is not installed")
+
+
+class SearchBudget:
+    """
+    How much searching a plan may do, shared out over its day groups.
+
+    Unused budget of one group carries over to the next. Searches stop at a wall-clock deadline,
+    unless `by_work` is set: then they count scored combinations instead, so that the same seed
+    always explores the same candidates and yields the same plan.
+    """
+
+    def __init__(self, time_budget_ms: float, group_count: int, by_work: bool = False):
+        self.by_work = by_work
+        self.started = time.perf_counter()
+        self.seconds = time_budget_ms / 1000.0
+        self.work = time_budget_ms * SCORED_COMBINATIONS_PER_MS
+        self.group_count = max(1, group_count)
+        self.share = 1.0
+        self.spent = 0
+
+    def start_group(self, group_number: int) -> None:
+        """Allow the search to use the budget up to the end of the `group_number`-th group (from 1)."""
+        self.share = group_number / self.group_count
+
+    def spend(self, combinations: int) -> None:
+        self.spent += combinations + SCORING_OVERHEAD
+
+    def remaining_seconds(self) -> float:
+        return self.started + self.seconds * self.share - time.perf_counter()
+
+    def exhausted(self) -> bool:
+        if self.by_work:
+            return self.spent >= self.work * self.share
+        return self.remaining_seconds() <= 0
+
+
+# Budget of searches that should run to completion
+UNLIMITED = SearchBudget(np.inf, 1)
+
+
+class PlanTargets(NamedTuple):
+    """Daily nutritional requirements a generated plan has to satisfy."""
+    daily_calories: float
+    daily_protein: float
+    min_carbs: float
+    max_carbs: float
+    min_fat: float
+    max_fat: float
+    error_margin: float
+    max_repeating_days: int
+    allow_cheat_meal: bool
+    num_days: int = DAYS_PER_WEEK
+    # Sorted ingredient ids; recipes must use one of the included and none of the excluded
+    include_ingredients: Tuple[int, ...] = ()
+    exclude_ingredients: Tuple[int, ...] = ()
+    strategy: str = "random"
+    time_budget_ms: int = DEFAULT_TIME_BUDGET_MS
+
+    def bounds(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return (lower, upper, scale) arrays for calories, protein, carbs and fat."""
+        margin = self.error_margin
+        lower = np.array([
+            self.daily_calories * (1 - margin),
+            self.daily_protein * (1 - margin),
+            self.min_carbs * (1 - margin),
+            self.min_fat * (1 - margin),
+        ])
+        upper = np.array([
+            self.daily_calories * (1 + margin),
+            np.inf,  # There is no upper limit on protein
+            self.max_carbs * (1 + margin),
+            self.max_fat * (1 + margin),
+        ])
+        scale = np.array([self.daily_calories, self.daily_protein, self.max_carbs, self.max_fat], dtype=np.float64)
+        scale[scale <= 0] = 1.0
+        return lower, upper, scale
+
+
+def violation_scores(totals: np.ndarray, lower: np.ndarray, upper: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """Score (k, 4) daily totals by their relative distance outside the bounds; 0 means feasible."""
+    below = np.maximum(lower - totals, 0.0)
+    above = np.maximum(totals - upper, 0.0)
+    return ((below + above) / scale).sum(axis=-1)
+
+
+def day_groups(num_days: int, max_repeating_days: int) -> List[range]:
+    """
+    Split the plan into runs of days that share the same meals.
+
+    Within each week, Monday to Saturday are cut into runs of `max_repeating_days` days and
+    Sunday always stands alone, so it can hold the cheat meal.
+    """
+    run_length = max(1, max_repeating_days)
+    groups = []
+    for week_start in range(1, num_days + 1, DAYS_PER_WEEK):
+        sunday = week_start + DAYS_PER_WEEK - 1
+        last_weekday = min(sunday - 1, num_days)
+        for start in range(week_start, last_weekday + 1, run_length):
+            groups.append(range(start, min(start + run_length - 1, last_weekday) + 1))
+        if sunday <= num_days:
+            groups.append(range(sunday, sunday + 1))
+    return groups
+
+
+def _pad_pool(pool: np.ndarray, size: int, universe: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Top a pool up to `size` entries with other recipes from `universe`."""
+    if len(pool) >= size:
+        return pool
+    rest = np.setdiff1d(universe, pool, assume_unique=True)
+    extra = rng.choice(rest, size=min(size - len(pool), len(rest)), replace=False)
+    return np.concatenate([pool, extra])
+
+
+def _candidate_combinations(sizes: List[int], rng: np.random.Generator) -> np.ndarray:
+    """Return a (k, 4) array of positions into the per-meal-type pools."""
+    if int(np.prod(sizes)) <= CANDIDATES_PER_GROUP:
+        # Small enough to score every combination
+        grids = np.meshgrid(*[np.arange(size) for size in sizes], indexing="ij")
+        return np.stack([grid.ravel() for grid in grids], axis=1)
+    return np.stack([rng.integers(0, size, CANDIDATES_PER_GROUP) for size in sizes], axis=1)
+
+
+def _sampled_positions(
+    macros: np.ndarray,
+    pools: List[np.ndarray],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    scale: np.ndarray,
+    rng: np.random.Generator,
+    pick_any_feasible: bool = True,
+    budget: SearchBudget = UNLIMITED
+) -> Tuple[np.ndarray, float]:
+    """Score a sample of combinations and return the pool positions of a feasible (or the best) one."""
+    combos = _candidate_combinations([len(pool) for pool in pools], rng)
+    # Gathering four meals per combination costs about twice a swap
+    budget.spend(2 * len(combos))
+    recipes = np.stack([pool[combos[:, i]] for i, pool in enumerate(pools)], axis=1)
+    totals = macros[recipes].sum(axis=1)
+    scores = violation_scores(totals, lower, upper, scale)
+
+    # Pick randomly among feasible combinations to keep plans varied
+    feasible = np.flatnonzero(scores <= FEASIBLE_SCORE)
+    best = rng.choice(feasible) if pick_any_feasible and len(feasible) else int(np.argmin(scores))
+    return combos[best], float(scores[best])
+
+
+def select_day_meals(
+    macros: np.ndarray,
+    pools: List[np.ndarray],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    scale: np.ndarray,
+    rng: np.random.Generator
+) -> Tuple[np.ndarray, float]:
+    """Pick one recipe index per pool so the day's totals are as close to the bounds as possible."""
+    positions, score = _sampled_positions(macros, pools, lower, upper, scale, rng)
+    return np.array([pool[position] for pool, position in zip(pools, positions)]), score
+
+
+def _swap_totals(
+    macros: np.ndarray,
+    pools: List[np.ndarray],
+    meal_macros: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the day totals after every possible single-meal swap, with the meal each one replaces.
+
+    Row k of the totals swaps meal `owners[k]` for the k-th entry of the concatenated pools.
+    """
+    swap_macros = np.concatenate([macros[pool] for pool in pools])
+    owners = np.repeat(np.arange(len(pools)), [len(pool) for pool in pools])
+    return meal_macros.sum(axis=0) - meal_macros[owners] + swap_macros, owners
+
+
+def _descend(
+    macros: np.ndarray,
+    pools: List[np.ndarray],
+    positions: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    scale: np.ndarray,
+    budget: SearchBudget = UNLIMITED
+) -> Tuple[np.ndarray, float]:
+    """Apply the best single-meal swap until none improves the score or the budget runs out, scoring every swap at once."""
+    starts = np.cumsum([0] + [len(pool) for pool in pools[:-1]])
+    positions = positions.copy()
+    meal_macros = np.stack([macros[pool[position]] for pool, position in zip(pools, positions)])
+    score = float(violation_scores(meal_macros.sum(axis=0), lower, upper, scale))
+    while score > FEASIBLE_SCORE and not budget.exhausted():
+        totals, owners = _swap_totals(macros, pools, meal_macros)
+        budget.spend(len(totals))
+        scores = violation_scores(totals, lower, upper, scale)
+        best = int(np.argmin(scores))
+        if scores[best] >= score - FEASIBLE_SCORE:
+            break
+        meal = owners[best]
+        positions[meal] = best - starts[meal]
+        meal_macros[meal] = macros[pools[meal][positions[meal]]]
+        score = float(scores[best])
+    return positions, score
+
+
+def _local_search(
+    macros: np.ndarray,
+    pools: List[np.ndarray],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    scale: np.ndarray,
+    rng: np.random.Generator,
+    budget: SearchBudget
+) -> Tuple[np.ndarray, float]:
+    """Descend from a sampled start, then re-draw two meals and descend again until feasible or out of budget."""
+    positions, score = _sampled_positions(macros, pools, lower, upper, scale, rng, budget=budget)
+    positions, score = _descend(macros, pools, positions, lower, upper, scale, budget)
+    while score > FEASIBLE_SCORE and not budget.exhausted():
+        candidate = positions.copy()
+        for meal in rng.choice(len(pools), size=min(2, len(pools)), replace=False):
+            candidate[meal] = rng.integers(len(pools[meal]))
+        candidate, candidate_score = _descend(macros, pools, candidate, lower, upper, scale, budget)
+        if candidate_score < score:
+            positions, score = candidate, candidate_score
+    return positions, score
+
+
+def _solve_milp(
+    pool_macros: List[np.ndarray],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    scale: np.ndarray,
+    rng: np.random.Generator,
+    time_limit: float
+) -> Optional[np.ndarray]:
+    """
+    Choose one row of each macro matrix minimizing the scaled distance outside the bounds as an integer program.
+
+    Returns the chosen row per matrix, or None when no solution was found in time.
+    """
+    sizes = [len(choices) for choices in pool_macros]
+    count = sum(sizes)
+    # Variables: one binary per choice, then shortfall and excess slacks per nutrient
+    slack = np.eye(4)
+    no_slack = np.zeros((4, 4))
+    one_per_pool = np.zeros((len(sizes), count + 8))
+    for meal, (start, size) in enumerate(zip(np.cumsum([0] + sizes[:-1]), sizes)):
+        one_per_pool[meal, start:start + size] = 1.0
+    choice_macros = np.concatenate(pool_macros).T
+    finite = np.isfinite(upper)
+    constraints = [
+        LinearConstraint(one_per_pool, 1.0, 1.0),
+        LinearConstraint(np.hstack([choice_macros, slack, no_slack]), lower, np.inf),
+        LinearConstraint(np.hstack([choice_macros, no_slack, -slack])[finite], -np.inf, upper[finite]),
+    ]
+    # A tiny random cost breaks ties between feasible plans so they stay varied
+    cost = np.concatenate([rng.random(count) * 1e-6, 1.0 / scale, 1.0 / scale])
+    result = milp(
+        cost,
+        constraints=constraints,
+        integrality=np.concatenate([np.ones(count), np.zeros(8)]),
+        bounds=Bounds(np.zeros(count + 8), np.concatenate([np.ones(count), np.full(8, np.inf)])),
+        # Presolve costs more than it saves on these small dense programs
+        options={"time_limit": time_limit, "presolve": False}
+    )
+    if result.x is None:
+        return None
+    chosen = np.split(result.x[:count], np.cumsum(sizes)[:-1])
+    return np.array([int(np.argmax(choice)) for choice in chosen])
+
+
+def _milp_search(
+    macros: np.ndarray,
+    pools: List[np.ndarray],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    scale: np.ndarray,
+    rng: np.random.Generator,
+    budget: SearchBudget
+) -> Tuple[np.ndarray, float]:
+    """
+    Descend from a sampled start, then solve exactly over the most promising recipes of each pool.
+
+    The integer program only sees the `MILP_CANDIDATES_PER_MEAL` best single swaps per meal, which
+    keeps it small enough to finish within the budget. The solver stops on the clock, so its
+    results depend on timing even for seeded plans.
+    """
+    check_strategy("milp")
+    positions, score = _sampled_positions(macros, pools, lower, upper, scale, rng, budget=budget)
+    positions, score = _descend(macros, pools, positions, lower, upper, scale, budget)
+    time_limit = budget.remaining_seconds()
+    if score <= FEASIBLE_SCORE or time_limit <= 0:
+        return positions, score
+
+    # Shortlist each pool by how good swapping it into the current day would be
+    meal_macros = np.stack([macros[pool[position]] for pool, position in zip(pools, positions)])
+    totals, owners = _swap_totals(macros, pools, meal_macros)
+    scores = violation_scores(totals, lower, upper, scale)
+    shortlists = []
+    for meal, pool in enumerate(pools):
+        meal_scores = scores[owners == meal]
+        keep = min(MILP_CANDIDATES_PER_MEAL, len(pool))
+        shortlist = np.argpartition(meal_scores, keep - 1)[:keep]
+        shortlists.append(np.union1d(shortlist, [positions[meal]]))
+
+    solved = _solve_milp([macros[pool[shortlist]] for pool, shortlist in zip(pools, shortlists)], lower, upper, scale, rng, time_limit)
+    if solved is not None:
+        candidate = np.array([shortlist[choice] for shortlist, choice in zip(shortlists, solved)])
+        candidate_totals = sum(macros[pool[position]] for pool, position in zip(pools, candidate))
+        candidate_score = float(violation_scores(candidate_totals, lower, upper, scale))
+        if candidate_score < score:
+            positions, score = candidate, candidate_score
+    return positions, score
+
+
+def search_day_meals(
+    macros: np.ndarray,
+    pools: List[np.ndarray],
+    lower: np.ndarray,
+    upper: np.ndarray,
+    scale: np.ndarray,
+    rng: np.random.Generator,
+    strategy: str = "random",
+    budget: SearchBudget = UNLIMITED
+) -> Tuple[np.ndarray, float]:
+    """Pick one recipe index per pool with the given strategy, stopping the budgeted ones when `budget` runs out."""
+    if strategy == "random":
+        return select_day_meals(macros, pools, lower, upper, scale, rng)
+
+    if strategy == "milp":
+        positions, score = _milp_search(macros, pools, lower, upper, scale, rng, budget)
+    elif strategy == "greedy":
+        positions, _ = _sampled_positions(macros, pools, lower, upper, scale, rng, pick_any_feasible=False, budget=budget)
+        positions, score = _descend(macros, pools, positions, lower, upper, scale, budget)
+    else:
+        positions, score = _local_search(macros, pools, lower, upper, scale, rng, budget)
+    return np.array([pool[position] for pool, position in zip(pools, positions)]), score
+
+
+def solve_meal_plan(
+    catalog: RecipeCatalog,
+    targets: PlanTargets,
+    rng: Optional[np.random.Generator] = None,
+    reproducible: bool = False
+) -> List[Dict]:
+    """
+    Assign recipes to every day and meal type of the plan, in time linear in its length (or within its time budget).
+
+    Pass `reproducible` for seeded plans: the search is then bounded by a fixed amount of work instead
+    of the clock, so the same `rng` seed always gives the same plan (except with the milp strategy).
+    """
+    check_strategy(targets.strategy)
+    if rng is None:
+        rng = np.random.default_rng()
+    if len(catalog) == 0:
+        return []
+
+    ids, macros = catalog.ids, catalog.macros
+    groups = day_groups(targets.num_days, targets.max_repeating_days)
+    lower, upper, scale = targets.bounds()
+
+    # Prune every pool with the ingredient filters before any selection happens
+    pools = catalog.meal_type_pools(targets.daily_calories)
+    allowed = catalog.recipe_mask(targets.include_ingredients, targets.exclude_ingredients)
+    if allowed is None:
+        universe = np.arange(len(ids))
+    else:
+        universe = np.flatnonzero(allowed)
+        if not len(universe):
+            raise NoMatchingRecipesError("No recipes match the ingredient filters")
+        pools = {meal_type: pool[allowed[pool]] for meal_type, pool in pools.items()}
+
+    # If not enough recipes in each category for a week, add more from general pool
+    pools = {meal_type: _pad_pool(pool, DAYS_PER_WEEK, universe, rng) for meal_type, pool in pools.items()}
+
+    # Track which recipes are already used for each meal type
+    available = {meal_type: np.ones(len(pool), dtype=bool) for meal_type, pool in pools.items()}
+
+    # Select a recipe for each week's cheat meal that's higher in calories
+    cheat_meals = {}
+    if targets.allow_cheat_meal:
+        sundays = range(DAYS_PER_WEEK, targets.num_days + 1, DAYS_PER_WEEK)
+        cheat_candidates = universe[macros[universe, CALORIES] > targets.daily_calories * 0.4]
+        if not len(cheat_candidates):
+            cheat_candidates = universe
+        cheat_meals = dict(zip(sundays, rng.choice(cheat_candidates, size=len(sundays))))
+
+    by_work = reproducible and targets.strategy in REPRODUCIBLE_STRATEGIES
+    budget = SearchBudget(targets.time_budget_ms, len(groups), by_work)
+
+    meal_plan_recipes = []
+    previous = {}
+    for group_number, group in enumerate(groups, start=1):
+        # Only consider recipes not used yet; once a pool is exhausted it may repeat, but never next to
+        # the same recipe on the days around the group, which would stretch its run past max_repeating_days
+        candidate_pools = []
+        for meal_type in MEAL_TYPES:
+            # Sunday lunch is the cheat meal, so the search fits the other meals of the day around it
+            if meal_type == "lunch" and group.start in cheat_meals:
+                candidate_pools.append(np.array([cheat_meals[group.start]]))
+                continue
+            neighbours = [previous.get(meal_type)]
+            if meal_type == "lunch":
+                neighbours.append(cheat_meals.get(group.stop))
+            fresh = ~np.isin(pools[meal_type], [index for index in neighbours if index is not None])
+            if not (available[meal_type] & fresh).any():
+                available[meal_type][:] = True
+            allowed = available[meal_type] & fresh
+            candidate_pools.append(pools[meal_type][allowed if allowed.any() else available[meal_type]])
+
+        budget.start_group(group_number)
+        selected, _ = search_day_meals(macros, candidate_pools, lower, upper, scale, rng, targets.strategy, budget)
+
+        for meal_type, index in zip(MEAL_TYPES, selected):
+            available[meal_type] &= pools[meal_type] != index
+        previous = dict(zip(MEAL_TYPES, selected))
+
+        for day in group:
+            for meal_type, index in zip(MEAL_TYPES, selected):
+                meal_plan_recipes.append({
+                    "recipe_id": int(ids[index]),
+                    "day": day,
+                    "meal_type": meal_type
+                })
+
+    return meal_plan_recipes
+
+
+def repeat_run_length(slot_recipes: Dict[int, int], day: int, recipe_id: int) -> int:
+    """Number of consecutive days a meal slot would serve `recipe_id` if `day` served it too."""
+    run = 1
+    for step in (-1, 1):
+        other = day + step
+        while slot_recipes.get(other) == recipe_id:
+            run += 1
+            other += step
+    return run
+
+
+def select_slot_replacement(
+    catalog: RecipeCatalog,
+    targets: PlanTargets,
+    day: int,
+    meal_type: str,
+    day_recipes: Dict[str, int],
+    slot_recipes: Dict[int, int],
+    rng: Optional[np.random.Generator] = None
+) -> Tuple[int, float]:
+    """
+    Pick a new recipe id for one meal of one day, scoring every candidate against the day's other meals at once.
+
+    `day_recipes` maps the day's meal types to recipe ids and `slot_recipes` maps every day of the plan
+    to the recipe id served for `meal_type`. Recipes the plan does not serve for this meal yet are
+    preferred, and no recipe may end up on more than `max_repeating_days` consecutive days.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    lower, upper, scale = targets.bounds()
+
+    # Totals of the day's other meals; recipes missing from the catalog count as zero
+    others = [
+        catalog.index_of[recipe_id] for other_type, recipe_id in day_recipes.items()
+        if other_type != meal_type and recipe_id in catalog.index_of
+    ]
+    day_totals = catalog.macros[others].sum(axis=0)
+
+    allowed = catalog.recipe_mask(targets.include_ingredients, targets.exclude_ingredients)
+    universe = np.arange(len(catalog)) if allowed is None else np.flatnonzero(allowed)
+    bucket = catalog.bucket(meal_type, targets.daily_calories)
+    if allowed is not None:
+        bucket = bucket[allowed[bucket]]
+
+    # Never keep the current recipe or stretch a neighbour's run past max_repeating_days
+    blocked = {day_recipes.get(meal_type)}
+    for neighbour in (slot_recipes.get(day - 1), slot_recipes.get(day + 1)):
+        if neighbour is not None and repeat_run_length(slot_recipes, day, neighbour) > max(1, targets.max_repeating_days):
+            blocked.add(neighbour)
+    blocked_ids = np.array([recipe_id for recipe_id in blocked if recipe_id is not None], dtype=np.int64)
+
+    # Fall back to every allowed recipe when the meal type's calorie band has none left
+    for pool in (bucket, universe):
+        candidates = pool[~np.isin(catalog.ids[pool], blocked_ids)]
+        if len(candidates):
+            break
+    else:
+        raise NoMatchingRecipesError("No other recipe can replace this meal")
+
+    scores = violation_scores(day_totals + catalog.macros[candidates], lower, upper, scale)
+    feasible = scores <= FEASIBLE_SCORE
+    unused = ~np.isin(catalog.ids[candidates], np.fromiter(slot_recipes.values(), dtype=np.int64))
+    for choices in (feasible & unused, feasible):
+        if choices.any():
+            best = rng.choice(np.flatnonzero(choices))
+            break
+    else:
+        best = int(np.argmin(scores))
+    return int(catalog.ids[candidates[best]]), float(scores[best])
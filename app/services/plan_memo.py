@@ -0,0 +1,55 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.services.plan_engine import PlanTargets
+
+# Number of generated plans remembered for identical seeded requests
+PLAN_MEMO_SIZE = int(os.getenv("PLAN_MEMO_SIZE", "256"))
+
+
+class MemoizedPlan(NamedTuple):
+    assignments: Tuple[Dict, ...]
+    meal_plan_id: int
+    name: str
+    num_people: int
+
+
+def plan_request_key(targets: PlanTargets, seed: int, catalog_version: int) -> str:
+    """Hash the inputs that fully determine a generated plan into a canonical key."""
+    canonical = json.dumps(
+        {**targets._asdict(), "seed": seed, "catalog_version": catalog_version},
+        sort_keys=True,
+        separators=(",", ":")
+    )
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+_lock = threading.Lock()
+_plans: "OrderedDict[str, MemoizedPlan]" = OrderedDict()
+
+
+def lookup_plan(key: str) -> Optional[MemoizedPlan]:
+    with _lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+        return plan
+
+
+def remember_plan(key: str, plan: MemoizedPlan) -> None:
+    with _lock:
+        _plans[key] = plan
+        _plans.move_to_end(key)
+        while len(_plans) > PLAN_MEMO_SIZE:
+            _plans.popitem(last=False)
+
+
+def forget_meal_plan(meal_plan_id: int) -> None:
+    """Drop the entries pointing at a plan whose assignments were replaced."""
+    with _lock:
+        for key in [key for key, plan in _plans.items() if plan.meal_plan_id == meal_plan_id]:
+            del _plans[key]
@@ -0,0 +1,141 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Tuple
+import threading
+import numpy as np
+
+from app.models import models
+
+# Column order of the macro matrix
+CALORIES, PROTEIN, CARBS, FAT = range(4)
+
+# Calorie band of each meal type as a share of the daily calories: (low, high, high_inclusive)
+MEAL_CALORIE_BANDS = {
+    "breakfast": (None, 0.3, False),
+    "lunch": (0.25, 0.4, True),
+    "dinner": (0.2, 0.35, True),
+    "snack": (None, 0.15, False),
+}
+
+
+class RecipeCatalog:
+    """Immutable columnar snapshot of every recipe's macros and ingredients."""
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        macros: np.ndarray,
+        version: int,
+        ingredient_bits: Optional[Dict[int, np.ndarray]] = None
+    ):
+        self.version = version
+        self.ids = ids
+        self.macros = macros
+        # Inverted index: ingredient id -> packed bitset over recipe indices
+        self.ingredient_bits = ingredient_bits or {}
+        # Recipe indices sorted by calories so every meal-type bucket is a slice
+        self.calorie_order = np.argsort(macros[:, CALORIES], kind="stable")
+        self.sorted_calories = macros[self.calorie_order, CALORIES]
+        self.index_of = {int(recipe_id): index for index, recipe_id in enumerate(ids)}
+
+        for array in (self.ids, self.macros, self.calorie_order, self.sorted_calories, *self.ingredient_bits.values()):
+            array.setflags(write=False)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def bucket(self, meal_type: str, daily_calories: float) -> np.ndarray:
+        """Return the indices of recipes whose calories fit the meal type's band."""
+        low, high, high_inclusive = MEAL_CALORIE_BANDS[meal_type]
+        start = 0 if low is None else np.searchsorted(self.sorted_calories, daily_calories * low, side="left")
+        end = np.searchsorted(self.sorted_calories, daily_calories * high, side="right" if high_inclusive else "left")
+        return self.calorie_order[start:end]
+
+    def meal_type_pools(self, daily_calories: float) -> Dict[str, np.ndarray]:
+        return {meal_type: self.bucket(meal_type, daily_calories) for meal_type in MEAL_CALORIE_BANDS}
+
+    def recipe_mask(self, include: Tuple[int, ...] = (), exclude: Tuple[int, ...] = ()) -> Optional[np.ndarray]:
+        """
+        Return a boolean mask of recipes using at least one `include` and no `exclude` ingredient,
+        or None when there is nothing to filter.
+        """
+        if not include and not exclude:
+            return None
+        no_recipes = np.zeros((len(self) + 7) // 8, dtype=np.uint8)
+        if include:
+            allowed = np.bitwise_or.reduce([self.ingredient_bits.get(ingredient_id, no_recipes) for ingredient_id in include])
+        else:
+            allowed = ~no_recipes
+        for ingredient_id in exclude:
+            allowed &= ~self.ingredient_bits.get(ingredient_id, no_recipes)
+        return np.unpackbits(allowed, count=len(self)).astype(bool)
+
+
+def load_catalog(db: Session, version: int = 0) -> RecipeCatalog:
+    """Build a catalog from the recipes table with a single column query."""
+    rows = db.query(
+        models.Recipe.id,
+        models.Recipe.calories,
+        models.Recipe.protein,
+        models.Recipe.carbs,
+        models.Recipe.fat
+    ).order_by(models.Recipe.id).all()
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    # Missing nutritional values become NaN here and count as zero
+    macros = np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 4)
+    return RecipeCatalog(ids, np.nan_to_num(macros), version, load_ingredient_bits(db, ids))
+
+
+def load_ingredient_bits(db: Session, ids: np.ndarray) -> Dict[int, np.ndarray]:
+    """Build the ingredient -> recipe bitsets from recipe_ingredient with a single query."""
+    pairs = np.array(db.query(
+        models.recipe_ingredient.c.ingredient_id,
+        models.recipe_ingredient.c.recipe_id
+    ).all(), dtype=np.int64).reshape(-1, 2)
+    if not len(pairs) or not len(ids):
+        return {}
+
+    # ids are sorted, so recipe positions are a binary search away
+    positions = np.searchsorted(ids, pairs[:, 1])
+    known = (positions < len(ids)) & (ids[np.minimum(positions, len(ids) - 1)] == pairs[:, 1])
+    ingredient_ids, positions = pairs[known, 0], positions[known]
+
+    order = np.argsort(ingredient_ids, kind="stable")
+    ingredient_ids, positions = ingredient_ids[order], positions[order]
+    unique_ids, starts = np.unique(ingredient_ids, return_index=True)
+
+    bits = {}
+    for ingredient_id, recipe_positions in zip(unique_ids, np.split(positions, starts[1:])):
+        mask = np.zeros(len(ids), dtype=bool)
+        mask[recipe_positions] = True
+        bits[int(ingredient_id)] = np.packbits(mask)
+    return bits
+
+
+_lock = threading.Lock()
+_version = 0
+_snapshot: Optional[RecipeCatalog] = None
+
+
+def catalog_version() -> int:
+    return _version
+
+
+def invalidate_catalog() -> None:
+    """Mark the current snapshot as stale; the next reader reloads it."""
+    global _version
+    with _lock:
+        _version += 1
+
+
+def get_catalog(db: Session) -> RecipeCatalog:
+    """Return the process-wide catalog snapshot, reloading it if it is stale."""
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == _version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.version != _version:
+            _snapshot = load_catalog(db, _version)
+        return _snapshot
@@ -0,0 +1,83 @@
+import re
+from sqlalchemy import exists, func, text
+from sqlalchemy.orm import Query, Session
+from typing import NamedTuple, Optional, Tuple
+
+from app.models import models
+
+# SQLite FTS5 index over recipe name, description and instructions (see migration 0006)
+RECIPE_FTS_TABLE = "recipes_fts"
+
+
+class RecipeFilters(NamedTuple):
+    min_calories: Optional[float] = None
+    max_calories: Optional[float] = None
+    min_protein: Optional[float] = None
+    max_protein: Optional[float] = None
+    min_carbs: Optional[float] = None
+    max_carbs: Optional[float] = None
+    min_fat: Optional[float] = None
+    max_fat: Optional[float] = None
+    max_total_time: Optional[int] = None
+    name_prefix: Optional[str] = None
+    text: Optional[str] = None
+    # A recipe must contain every one of these, unlike a meal plan's include_ingredient_ids
+    include_all_ingredients: Tuple[int, ...] = ()
+    exclude_ingredients: Tuple[int, ...] = ()
+
+
+def fts_match_expression(search: str) -> Optional[str]:
+    """Turn free text into an FTS5 query matching every word as a prefix, with no operators."""
+    words = re.findall(r"\w+", search)
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def filter_recipes(query: Query, db: Session, filters: RecipeFilters) -> Query:
+    """Apply the search filters to a Recipe query; every filter is backed by an index."""
+    # Macro ranges use ix_recipes_macros
+    for name in ("calories", "protein", "carbs", "fat"):
+        column = getattr(models.Recipe, name)
+        low, high = getattr(filters, f"min_{name}"), getattr(filters, f"max_{name}")
+        if low is not None:
+            query = query.filter(column >= low)
+        if high is not None:
+            query = query.filter(column <= high)
+
+    # Same expression as ix_recipes_total_time, so the index applies
+    if filters.max_total_time is not None:
+        query = query.filter(models.Recipe.prep_time + models.Recipe.cook_time <= filters.max_total_time)
+
+    # Case-insensitive prefix as a range scan of ix_recipes_name_lower
+    if filters.name_prefix:
+        prefix = filters.name_prefix.lower()
+        name = func.lower(models.Recipe.name)
+        query = query.filter(name >= prefix, name < prefix + "\U0010ffff")
+
+    if filters.text:
+        match = fts_match_expression(filters.text)
+        if match is None:
+            return query.filter(False)
+        if db.get_bind().dialect.name == "sqlite":
+            query = query.filter(models.Recipe.id.in_(
+                text(f"SELECT rowid FROM {RECIPE_FTS_TABLE} WHERE {RECIPE_FTS_TABLE} MATCH :fts_match").bindparams(fts_match=match)
+            ))
+        else:
+            pattern = f"%{filters.text}%"
+            query = query.filter(
+                models.Recipe.name.ilike(pattern)
+                | models.Recipe.description.ilike(pattern)
+                | models.Recipe.instructions.ilike(pattern)
+            )
+
+    # Ingredient membership is answered from the recipe_ingredient primary key and reverse index
+    for ingredient_id in filters.include_all_ingredients:
+        query = query.filter(exists().where(
+            models.recipe_ingredient.c.recipe_id == models.Recipe.id,
+            models.recipe_ingredient.c.ingredient_id == ingredient_id
+        ))
+    if filters.exclude_ingredients:
+        query = query.filter(~exists().where(
+            models.recipe_ingredient.c.recipe_id == models.Recipe.id,
+            models.recipe_ingredient.c.ingredient_id.in_(filters.exclude_ingredients)
+        ))
+    return query
@@ -0,0 +1,149 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+from pydantic import ValidationError
+from typing import List, Dict, Set, Tuple
+
+from app.models import models
+from app.schemas import schemas
+from app.services.nutrition import recompute_recipe_macros
+
+def build_recipe(recipe: schemas.RecipeCreate) -> models.Recipe:
+    """Create an unsaved recipe row from the request, without its ingredients."""
+    return models.Recipe(
+        name=recipe.name,
+        description=recipe.description,
+        instructions=recipe.instructions,
+        prep_time=recipe.prep_time,
+        cook_time=recipe.cook_time,
+        servings=recipe.servings,
+        calories=recipe.calories,
+        protein=recipe.protein,
+        carbs=recipe.carbs,
+        fat=recipe.fat
+    )
+
+def build_ingredient(ingredient: schemas.IngredientCreate) -> models.Ingredient:
+    return models.Ingredient(
+        name=ingredient.name,
+        calories_per_100g=ingredient.calories_per_100g,
+        protein_per_100g=ingredient.protein_per_100g,
+        carbs_per_100g=ingredient.carbs_per_100g,
+        fat_per_100g=ingredient.fat_per_100g,
+        grams_per_ml=ingredient.grams_per_ml,
+        grams_per_piece=ingredient.grams_per_piece
+    )
+
+def find_missing_ingredient_ids(db: Session, ingredient_ids: List[int]) -> Set[int]:
+    """Return the ids that do not exist, using one set-based lookup."""
+    wanted = set(ingredient_ids)
+    if not wanted:
+        return set()
+    found = db.query(models.Ingredient.id).filter(models.Ingredient.id.in_(wanted)).all()
+    return wanted - {ingredient_id for ingredient_id, in found}
+
+def insert_recipe_ingredients(db: Session, recipes: List[Tuple[int, schemas.RecipeCreate]]) -> None:
+    """Insert the ingredient lines of several flushed recipes with a single executemany."""
+    rows = [
+        {
+            "recipe_id": recipe_id,
+            "ingredient_id": ingredient_data.ingredient_id,
+            "amount": ingredient_data.amount,
+            "unit": ingredient_data.unit
+        }
+        for recipe_id, recipe in recipes
+        for ingredient_data in recipe.ingredients
+    ]
+    if rows:
+        db.execute(models.recipe_ingredient.insert(), rows)
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'body'}: {err['msg']}"
+        for err in error.errors()
+    )
+
+def _parse_rows(lines: List[Tuple[int, bytes]], schema, errors: List[Dict]) -> List[Tuple[int, object]]:
+    parsed = []
+    for line_number, line in lines:
+        try:
+            parsed.append((line_number, schema.model_validate_json(line)))
+        except ValidationError as e:
+            errors.append({"line": line_number, "detail": format_validation_error(e)})
+    return parsed
+
+def _save_recipes(db: Session, rows: List[Tuple[int, schemas.RecipeCreate]]) -> List[int]:
+    db_recipes = [build_recipe(recipe) for _, recipe in rows]
+    db.add_all(db_recipes)
+    db.flush()
+    recipe_ids = [db_recipe.id for db_recipe in db_recipes]
+    insert_recipe_ingredients(db, [(recipe_id, recipe) for recipe_id, (_, recipe) in zip(recipe_ids, rows)])
+    recompute_recipe_macros(db, recipe_ids)
+    db.commit()
+    return recipe_ids
+
+def _save_ingredients(db: Session, rows: List[Tuple[int, schemas.IngredientCreate]]) -> List[int]:
+    db_ingredients = [build_ingredient(ingredient) for _, ingredient in rows]
+    db.add_all(db_ingredients)
+    db.flush()
+    ingredient_ids = [db_ingredient.id for db_ingredient in db_ingredients]
+    db.commit()
+    return ingredient_ids
+
+def _save_chunk(db: Session, rows: List[Tuple[int, object]], save, result: Dict) -> None:
+    """Save a chunk in one transaction; if it fails, retry row by row to pinpoint the bad rows."""
+    if not rows:
+        return
+    try:
+        result["ids"].extend(save(db, rows))
+        return
+    except IntegrityError:
+        db.rollback()
+
+    for row in rows:
+        try:
+            result["ids"].extend(save(db, [row]))
+        except IntegrityError as e:
+            db.rollback()
+            result["errors"].append({"line": row[0], "detail": str(e.orig)})
+
+def import_recipe_chunk(db: Session, lines: List[Tuple[int, bytes]], result: Dict) -> None:
+    """Validate and insert a chunk of NDJSON recipe lines, recording per-row errors in `result`."""
+    rows = _parse_rows(lines, schemas.RecipeCreate, result["errors"])
+
+    # Check every referenced ingredient of the chunk with a single query
+    missing = find_missing_ingredient_ids(
+        db, [ingredient.ingredient_id for _, recipe in rows for ingredient in recipe.ingredients]
+    )
+
+    valid_rows = []
+    for line_number, recipe in rows:
+        ingredient_ids = [ingredient.ingredient_id for ingredient in recipe.ingredients]
+        missing_ids = [ingredient_id for ingredient_id in ingredient_ids if ingredient_id in missing]
+        if missing_ids:
+            result["errors"].append({"line": line_number, "detail": f"Ingredient with id {missing_ids[0]} not found"})
+        elif len(set(ingredient_ids)) != len(ingredient_ids):
+            result["errors"].append({"line": line_number, "detail": "Ingredient listed more than once"})
+        else:
+            valid_rows.append((line_number, recipe))
+
+    _save_chunk(db, valid_rows, _save_recipes, result)
+
+def import_ingredient_chunk(db: Session, lines: List[Tuple[int, bytes]], result: Dict) -> None:
+    """Validate and insert a chunk of NDJSON ingredient lines, recording per-row errors in `result`."""
+    rows = _parse_rows(lines, schemas.IngredientCreate, result["errors"])
+
+    # Ingredient names are unique, so look up every name of the chunk at once
+    names = {ingredient.name for _, ingredient in rows}
+    existing = {
+        name for name, in db.query(models.Ingredient.name).filter(models.Ingredient.name.in_(names)).all()
+    } if names else set()
+
+    valid_rows = []
+    for line_number, ingredient in rows:
+        if ingredient.name in existing:
+            result["errors"].append({"line": line_number, "detail": f"Ingredient {ingredient.name!r} already exists"})
+        else:
+            existing.add(ingredient.name)
+            valid_rows.append((line_number, ingredient))
+
+    _save_chunk(db, valid_rows, _save_ingredients, result)
@@ -0,0 +1,25 @@
+from functools import lru_cache
+from typing import Any
+from fastapi import Response
+from pydantic import TypeAdapter
+
+
+class JSONBytesResponse(Response):
+    """Response for a body that is already encoded JSON, so FastAPI does not validate or encode it again."""
+    media_type = "application/json"
+
+
+@lru_cache(maxsize=None)
+def type_adapter(schema: Any) -> TypeAdapter:
+    # Building an adapter compiles its validator and serializer, so reuse them
+    return TypeAdapter(schema)
+
+
+def dump_json(schema: Any, data: Any) -> bytes:
+    """Validate `data` against `schema` once and serialize it to JSON in pydantic-core."""
+    adapter = type_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(data))
+
+
+def json_response(schema: Any, data: Any, status_code: int = 200) -> JSONBytesResponse:
+    return JSONBytesResponse(content=dump_json(schema, data), status_code=status_code)
@@ -0,0 +1,29 @@
+from typing import AsyncIterator, List, Tuple
+from fastapi import Request
+
+async def iter_ndjson_chunks(request: Request, chunk_size: int) -> AsyncIterator[List[Tuple[int, bytes]]]:
+    """
+    Stream the request body as chunks of (line_number, line) pairs without buffering it whole.
+
+    Blank lines are skipped but still counted, so line numbers match the uploaded file.
+    """
+    buffer = b""
+    line_number = 0
+    chunk = []
+
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                chunk.append((line_number, line))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+
+    # The last line may not end with a newline
+    if buffer.strip():
+        chunk.append((line_number + 1, buffer))
+    if chunk:
+        yield chunk
@@ -0,0 +1,124 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, NamedTuple, Optional, Set
+from fastapi import Request, Response
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    expires_at: float
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of serialized JSON responses with a TTL.
+
+    Entries are keyed by (kind, meal_plan_id) and remember which recipes they were built
+    from, so editing a recipe drops every cached response that depends on it.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._keys_by_plan: Dict[int, Set[Hashable]] = {}
+        self._plans_by_recipe: Dict[int, Set[int]] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        """Changes on every invalidation; read it before building a response to pass to put()."""
+        return self._generation
+
+    def get(self, kind: str, meal_plan_id: int) -> Optional[CachedResponse]:
+        key = (kind, meal_plan_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(
+        self,
+        kind: str,
+        meal_plan_id: int,
+        body: bytes,
+        recipe_ids: Iterable[int],
+        generation: int
+    ) -> CachedResponse:
+        """Store a response unless something was invalidated since `generation` was read."""
+        entry = CachedResponse(body, make_etag(body), time.monotonic() + self.ttl_seconds)
+        key = (kind, meal_plan_id)
+        with self._lock:
+            if generation != self._generation:
+                return entry
+            self._drop(key)
+            self._entries[key] = entry
+            self._keys_by_plan.setdefault(meal_plan_id, set()).add(key)
+            for recipe_id in recipe_ids:
+                self._plans_by_recipe.setdefault(recipe_id, set()).add(meal_plan_id)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def invalidate_meal_plan(self, meal_plan_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in list(self._keys_by_plan.get(meal_plan_id, ())):
+                self._drop(key)
+
+    def invalidate_recipe(self, recipe_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            for meal_plan_id in self._plans_by_recipe.pop(recipe_id, set()):
+                for key in list(self._keys_by_plan.get(meal_plan_id, ())):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._keys_by_plan.clear()
+            self._plans_by_recipe.clear()
+
+    def _drop(self, key) -> None:
+        if self._entries.pop(key, None) is None:
+            return
+        meal_plan_id = key[1]
+        keys = self._keys_by_plan.get(meal_plan_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_plan[meal_plan_id]
+        # Stale recipe -> plan links are harmless; they only cause an extra invalidation
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison: W/"x" matches "x"
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+def cached_json_response(request: Request, entry: CachedResponse) -> Response:
+    """Answer with 304 Not Modified when the client already has this version."""
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+# Meal plans are immutable once generated, so their responses are safe to keep until invalidated
+meal_plan_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+)
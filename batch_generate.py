@@ -0,0 +1,58 @@
+"""Generate meal plans for many client profiles at once.
+
+Profiles are read as NDJSON, one MealPlanCreate per line:
+
+    python batch_generate.py profiles.ndjson --seed 42 --workers 8
+"""
+import argparse
+import sys
+import time
+
+from app.db.database import SessionLocal, create_tables
+from app.schemas import schemas
+from app.services.batch_generation import create_meal_plans, generation_pool, plan_seeds, worker_count
+from app.services.recipe_catalog import get_catalog
+
+
+def read_profiles(path):
+    with (sys.stdin if path == "-" else open(path)) as source:
+        return [schemas.MealPlanCreate.model_validate_json(line) for line in source if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("profiles", help="NDJSON file of meal plan requests, or - for stdin")
+    parser.add_argument("--seed", type=int, default=None, help="Seed that makes the whole run reproducible")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (defaults to the number of cores)")
+    parser.add_argument("--commit-every", type=int, default=1000, help="Plans written per transaction")
+    args = parser.parse_args()
+
+    profiles = read_profiles(args.profiles)
+    create_tables()
+    db = SessionLocal()
+    try:
+        # Every worker gets the same catalog snapshot once, when the pool starts
+        catalog = get_catalog(db)
+        seeds = plan_seeds(profiles, args.seed)
+        workers = worker_count(len(profiles), args.workers)
+        pool = generation_pool(catalog, workers) if workers > 1 else None
+
+        started = time.perf_counter()
+        created = 0
+        try:
+            for start in range(0, len(profiles), args.commit_every):
+                end = start + args.commit_every
+                created += len(create_meal_plans(db, profiles[start:end], seeds[start:end], catalog, pool))
+                print(f"{created}/{len(profiles)} plans written", file=sys.stderr)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Generated {created} plans with {workers} worker(s) in {elapsed:.1f}s ({created / max(elapsed, 1e-9):.0f} plans/s)")
+
+
+if __name__ == "__main__":
+    main()
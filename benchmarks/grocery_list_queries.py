@@ -0,0 +1,85 @@
+"""Show that building a grocery list costs the same number of queries for any plan length.
+
+Run from the repository root:
+
+    python -m benchmarks.grocery_list_queries
+"""
+import random
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.database import Base
+from app.models import models
+from app.services.meal_plan_service import generate_grocery_list
+
+MEAL_TYPES = ["breakfast", "lunch", "dinner", "snack"]
+PLAN_LENGTHS = [7, 28, 90, 365]
+NUM_RECIPES = 500
+NUM_INGREDIENTS = 200
+INGREDIENTS_PER_RECIPE = 8
+
+
+def seed_catalog(db, rnd):
+    db.add_all([
+        models.Ingredient(
+            name=f"ingredient {i}",
+            calories_per_100g=rnd.uniform(20, 400),
+            protein_per_100g=rnd.uniform(0, 30),
+            carbs_per_100g=rnd.uniform(0, 60),
+            fat_per_100g=rnd.uniform(0, 30)
+        ) for i in range(NUM_INGREDIENTS)
+    ])
+    db.add_all([
+        models.Recipe(
+            name=f"recipe {i}", instructions="", prep_time=10, cook_time=20,
+            servings=rnd.randint(1, 4), calories=500, protein=30, carbs=50, fat=20
+        ) for i in range(NUM_RECIPES)
+    ])
+    db.flush()
+    db.execute(models.recipe_ingredient.insert(), [
+        {"recipe_id": recipe_id, "ingredient_id": ingredient_id, "amount": rnd.uniform(10, 300), "unit": "g"}
+        for recipe_id in range(1, NUM_RECIPES + 1)
+        for ingredient_id in rnd.sample(range(1, NUM_INGREDIENTS + 1), INGREDIENTS_PER_RECIPE)
+    ])
+
+
+def seed_plan(db, days, rnd):
+    meal_plan = models.MealPlan(name=f"{days} day plan", num_people=2, days=days)
+    db.add(meal_plan)
+    db.flush()
+    db.execute(models.meal_plan_recipe.insert(), [
+        {"meal_plan_id": meal_plan.id, "recipe_id": rnd.randint(1, NUM_RECIPES), "day": day, "meal_type": meal_type}
+        for day in range(1, days + 1)
+        for meal_type in MEAL_TYPES
+    ])
+    return meal_plan
+
+
+def main():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    rnd = random.Random(42)
+    seed_catalog(db, rnd)
+    plans = [seed_plan(db, days, rnd) for days in PLAN_LENGTHS]
+    db.commit()
+    for meal_plan in plans:
+        db.refresh(meal_plan)
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    print(f"{'days':>6} {'meals':>6} {'queries':>8} {'items':>6} {'ms':>8}")
+    for days, meal_plan in zip(PLAN_LENGTHS, plans):
+        statements.clear()
+        start = time.perf_counter()
+        grocery_list = generate_grocery_list(db, meal_plan)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{days:>6} {days * len(MEAL_TYPES):>6} {len(statements):>8} {len(grocery_list.items):>6} {elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,14 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.db.database import create_tables
 from app.routers import recipes, meal_plans
+from app.services.generation_jobs import start_workers, stop_workers
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_tables()
+    start_workers()
     yield
+    stop_workers()
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(recipes.router)
@@ -0,0 +1,103 @@
+"""Initial schema, as created by Base.metadata.create_all before migrations existed
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "recipes",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("description", sa.String(), nullable=True),
+        sa.Column("instructions", sa.String(), nullable=True),
+        sa.Column("prep_time", sa.Integer(), nullable=True),
+        sa.Column("cook_time", sa.Integer(), nullable=True),
+        sa.Column("servings", sa.Integer(), nullable=True),
+        sa.Column("calories", sa.Float(), nullable=True),
+        sa.Column("protein", sa.Float(), nullable=True),
+        sa.Column("carbs", sa.Float(), nullable=True),
+        sa.Column("fat", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_recipes_id", "recipes", ["id"])
+    op.create_index("ix_recipes_name", "recipes", ["name"])
+
+    op.create_table(
+        "ingredients",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("calories_per_100g", sa.Float(), nullable=True),
+        sa.Column("protein_per_100g", sa.Float(), nullable=True),
+        sa.Column("carbs_per_100g", sa.Float(), nullable=True),
+        sa.Column("fat_per_100g", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_ingredients_id", "ingredients", ["id"])
+    op.create_index("ix_ingredients_name", "ingredients", ["name"], unique=True)
+
+    op.create_table(
+        "meal_plans",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=True),
+        sa.Column("daily_calories", sa.Float(), nullable=True),
+        sa.Column("daily_protein", sa.Float(), nullable=True),
+        sa.Column("min_carbs", sa.Float(), nullable=True),
+        sa.Column("max_carbs", sa.Float(), nullable=True),
+        sa.Column("min_fat", sa.Float(), nullable=True),
+        sa.Column("max_fat", sa.Float(), nullable=True),
+        sa.Column("num_people", sa.Integer(), nullable=True),
+        sa.Column("days", sa.Integer(), nullable=True),
+        sa.Column("error_margin", sa.Float(), nullable=True),
+        sa.Column("max_repeating_days", sa.Integer(), nullable=True),
+        sa.Column("allow_cheat_meal", sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_meal_plans_id", "meal_plans", ["id"])
+    op.create_index("ix_meal_plans_name", "meal_plans", ["name"])
+
+    op.create_table(
+        "recipe_ingredient",
+        sa.Column("recipe_id", sa.Integer(), nullable=False),
+        sa.Column("ingredient_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=True),
+        sa.Column("unit", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["ingredient_id"], ["ingredients.id"]),
+        sa.ForeignKeyConstraint(["recipe_id"], ["recipes.id"]),
+        sa.PrimaryKeyConstraint("recipe_id", "ingredient_id"),
+    )
+
+    op.create_table(
+        "meal_plan_recipe",
+        sa.Column("meal_plan_id", sa.Integer(), nullable=False),
+        sa.Column("recipe_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Integer(), nullable=False),
+        sa.Column("meal_type", sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(["meal_plan_id"], ["meal_plans.id"]),
+        sa.ForeignKeyConstraint(["recipe_id"], ["recipes.id"]),
+        sa.PrimaryKeyConstraint("meal_plan_id", "recipe_id", "day", "meal_type"),
+    )
+
+
+def downgrade():
+    op.drop_table("meal_plan_recipe")
+    op.drop_table("recipe_ingredient")
+    op.drop_index("ix_meal_plans_name", table_name="meal_plans")
+    op.drop_index("ix_meal_plans_id", table_name="meal_plans")
+    op.drop_table("meal_plans")
+    op.drop_index("ix_ingredients_name", table_name="ingredients")
+    op.drop_index("ix_ingredients_id", table_name="ingredients")
+    op.drop_table("ingredients")
+    op.drop_index("ix_recipes_name", table_name="recipes")
+    op.drop_index("ix_recipes_id", table_name="recipes")
+    op.drop_table("recipes")
@@ -0,0 +1,35 @@
+"""Secondary indexes on the association tables
+
+recipe_ingredient and meal_plan_recipe only had their composite primary keys, so
+reverse lookups by ingredient or recipe scanned the whole table.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Which recipes use ingredient Y
+    op.create_index("ix_recipe_ingredient_ingredient_id", "recipe_ingredient", ["ingredient_id", "recipe_id"])
+    # Covers grocery aggregation so the table rows are never read
+    op.create_index(
+        "ix_recipe_ingredient_recipe_covering",
+        "recipe_ingredient",
+        ["recipe_id", "ingredient_id", "unit", "amount"],
+    )
+    # Which plans use recipe X
+    op.create_index("ix_meal_plan_recipe_recipe_id", "meal_plan_recipe", ["recipe_id", "meal_plan_id"])
+
+
+def downgrade():
+    op.drop_index("ix_meal_plan_recipe_recipe_id", table_name="meal_plan_recipe")
+    op.drop_index("ix_recipe_ingredient_recipe_covering", table_name="recipe_ingredient")
+    op.drop_index("ix_recipe_ingredient_ingredient_id", table_name="recipe_ingredient")
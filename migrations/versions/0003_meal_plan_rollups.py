@@ -0,0 +1,64 @@
+"""Materialized nutrition rollups per meal plan and per plan day
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "meal_plan_day_summary",
+        sa.Column("meal_plan_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Integer(), nullable=False),
+        sa.Column("total_calories", sa.Float(), nullable=False),
+        sa.Column("total_protein", sa.Float(), nullable=False),
+        sa.Column("total_carbs", sa.Float(), nullable=False),
+        sa.Column("total_fat", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["meal_plan_id"], ["meal_plans.id"]),
+        sa.PrimaryKeyConstraint("meal_plan_id", "day"),
+    )
+    with op.batch_alter_table("meal_plans") as batch_op:
+        batch_op.add_column(sa.Column("total_calories", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("total_protein", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("total_carbs", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("total_fat", sa.Float(), nullable=True))
+        batch_op.create_index("ix_meal_plans_total_calories", ["total_calories"])
+        batch_op.create_index("ix_meal_plans_total_protein", ["total_protein"])
+
+    # Backfill the rollups of existing plans
+    op.execute("""
+        INSERT INTO meal_plan_day_summary (meal_plan_id, day, total_calories, total_protein, total_carbs, total_fat)
+        SELECT mpr.meal_plan_id, mpr.day,
+               COALESCE(SUM(r.calories), 0), COALESCE(SUM(r.protein), 0),
+               COALESCE(SUM(r.carbs), 0), COALESCE(SUM(r.fat), 0)
+        FROM meal_plan_recipe mpr JOIN recipes r ON r.id = mpr.recipe_id
+        GROUP BY mpr.meal_plan_id, mpr.day
+    """)
+    op.execute("""
+        UPDATE meal_plans SET
+            total_calories = (SELECT COALESCE(SUM(s.total_calories), 0) FROM meal_plan_day_summary s WHERE s.meal_plan_id = meal_plans.id),
+            total_protein = (SELECT COALESCE(SUM(s.total_protein), 0) FROM meal_plan_day_summary s WHERE s.meal_plan_id = meal_plans.id),
+            total_carbs = (SELECT COALESCE(SUM(s.total_carbs), 0) FROM meal_plan_day_summary s WHERE s.meal_plan_id = meal_plans.id),
+            total_fat = (SELECT COALESCE(SUM(s.total_fat), 0) FROM meal_plan_day_summary s WHERE s.meal_plan_id = meal_plans.id),
+            days = (SELECT COUNT(*) FROM meal_plan_day_summary s WHERE s.meal_plan_id = meal_plans.id)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table("meal_plans") as batch_op:
+        batch_op.drop_index("ix_meal_plans_total_protein")
+        batch_op.drop_index("ix_meal_plans_total_calories")
+        batch_op.drop_column("total_fat")
+        batch_op.drop_column("total_carbs")
+        batch_op.drop_column("total_protein")
+        batch_op.drop_column("total_calories")
+    op.drop_table("meal_plan_day_summary")
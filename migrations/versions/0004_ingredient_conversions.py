@@ -0,0 +1,26 @@
+"""Ingredient density and piece weight for unit conversion
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("ingredients") as batch_op:
+        batch_op.add_column(sa.Column("grams_per_ml", sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column("grams_per_piece", sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("ingredients") as batch_op:
+        batch_op.drop_column("grams_per_piece")
+        batch_op.drop_column("grams_per_ml")
@@ -0,0 +1,24 @@
+"""Seed used to generate a meal plan
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("meal_plans") as batch_op:
+        batch_op.add_column(sa.Column("seed", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("meal_plans") as batch_op:
+        batch_op.drop_column("seed")
@@ -0,0 +1,63 @@
+"""Indexes and full-text search for recipe filtering
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_recipes_macros", "recipes", ["calories", "protein", "carbs", "fat"])
+    op.create_index("ix_recipes_total_time", "recipes", [sa.text("(prep_time + cook_time)")])
+    op.create_index("ix_recipes_name_lower", "recipes", [sa.text("lower(name)")])
+
+    if op.get_bind().dialect.name != "sqlite":
+        return
+
+    # External-content FTS5 table kept in sync with recipes by triggers
+    op.execute("""
+        CREATE VIRTUAL TABLE recipes_fts USING fts5(
+            name, description, instructions,
+            content='recipes', content_rowid='id'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER recipes_fts_insert AFTER INSERT ON recipes BEGIN
+            INSERT INTO recipes_fts(rowid, name, description, instructions)
+            VALUES (new.id, new.name, new.description, new.instructions);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER recipes_fts_delete AFTER DELETE ON recipes BEGIN
+            INSERT INTO recipes_fts(recipes_fts, rowid, name, description, instructions)
+            VALUES ('delete', old.id, old.name, old.description, old.instructions);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER recipes_fts_update AFTER UPDATE OF name, description, instructions ON recipes BEGIN
+            INSERT INTO recipes_fts(recipes_fts, rowid, name, description, instructions)
+            VALUES ('delete', old.id, old.name, old.description, old.instructions);
+            INSERT INTO recipes_fts(rowid, name, description, instructions)
+            VALUES (new.id, new.name, new.description, new.instructions);
+        END
+    """)
+    op.execute("INSERT INTO recipes_fts(recipes_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS recipes_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS recipes_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS recipes_fts_insert")
+        op.execute("DROP TABLE IF EXISTS recipes_fts")
+    op.drop_index("ix_recipes_name_lower", "recipes")
+    op.drop_index("ix_recipes_total_time", "recipes")
+    op.drop_index("ix_recipes_macros", "recipes")
@@ -0,0 +1,26 @@
+"""Ingredient include/exclude filters on meal plans
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("meal_plans") as batch_op:
+        batch_op.add_column(sa.Column("include_ingredient_ids", sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column("exclude_ingredient_ids", sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("meal_plans") as batch_op:
+        batch_op.drop_column("exclude_ingredient_ids")
+        batch_op.drop_column("include_ingredient_ids")
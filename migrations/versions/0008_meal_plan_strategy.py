@@ -0,0 +1,26 @@
+"""Search strategy and time budget on meal plans
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("meal_plans") as batch_op:
+        batch_op.add_column(sa.Column("strategy", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("time_budget_ms", sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("meal_plans") as batch_op:
+        batch_op.drop_column("time_budget_ms")
+        batch_op.drop_column("strategy")